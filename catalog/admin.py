@@ -3,7 +3,7 @@ from .models import Category, Product
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'parent', 'get_full_path', 'created_at']
+    list_display = ['name', 'parent', 'full_path', 'created_at']
     list_filter = ['created_at', 'parent']
     search_fields = ['name']
     ordering = ['name']
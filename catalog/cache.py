@@ -0,0 +1,74 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'catalog:generation:{scope}'
+RESPONSE_KEY = 'catalog:response:{digest}'
+FACETS_KEY = 'catalog:facets:{digest}'
+
+
+def new_generation():
+    # Taken from the clock, so an evicted scope never returns to a value used before
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    """
+    Current generation of each scope, fetched in a single round trip
+    """
+    keys = [GENERATION_KEY.format(scope=scope) for scope in scopes]
+    generations = cache.get_many(keys)
+
+    missing = {key: new_generation() for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+
+    return [generations[key] for key in keys]
+
+
+def bump_generations(scopes):
+    """
+    Move every scope to a fresh generation in a single round trip,
+    however many products a bulk write touched
+    """
+    generation = new_generation()
+    cache.set_many({GENERATION_KEY.format(scope=scope): generation for scope in scopes}, timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Move the given scopes to a new generation, orphaning every response cached under them.
+    Bumped again on commit, since a concurrent read may have cached the
+    pre-commit data under the intermediate generation
+    """
+    scopes = set(scopes)
+    bump_generations(scopes)
+    transaction.on_commit(lambda: bump_generations(scopes))
+
+
+def invalidate_products(product_ids, category_paths=()):
+    """
+    Invalidate products, the product lists and the subtree aggregates of their categories
+    """
+    scopes = ['products', *(f'product:{pk}' for pk in product_ids)]
+    for path in category_paths:
+        if path:
+            scopes.extend(f'subtree:{pk}' for pk in path.split('/')[:-1])
+    invalidate(*scopes)
+
+
+def get_response_key(request, scopes, ignored_params=(), key=RESPONSE_KEY):
+    """
+    Cache key of a response covering the URL, its query parameters and its scopes.
+    Parameters that do not change the cached value can be ignored
+    """
+    query = sorted(
+        (param, sorted(values)) for param, values in request.query_params.lists()
+        if param not in ignored_params
+    )
+    generations = get_generations(scopes)
+    raw = f"{request.build_absolute_uri(request.path)}|{query}|{list(zip(scopes, generations))}"
+    return key.format(digest=hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest())
@@ -0,0 +1,77 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django_filters import rest_framework as django_filters
+from rest_framework import filters
+
+from .models import Category, Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Product filters, including every product in a category's subtree
+    """
+    category_tree = django_filters.ModelChoiceFilter(
+        queryset=Category.objects.all(), method='filter_category_tree'
+    )
+
+    class Meta:
+        model = Product
+        fields = ['category', 'category__parent']
+
+    def filter_category_tree(self, queryset, name, value):
+        # Descendants share the materialized path prefix, an indexed range lookup
+        return queryset.filter(category__path__startswith=value.path)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Full-text product search ranked by relevance.
+    Uses the indexed search_vector on PostgreSQL and falls back to
+    substring matching on other databases, such as SQLite in tests
+    """
+    search_config = 'english'
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '').strip()
+        if not search:
+            return queryset
+
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(search, search_type='websearch', config=self.search_config)
+            return queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            )
+
+        return self.fallback_filter_queryset(request, queryset, view)
+
+    def fallback_filter_queryset(self, request, queryset, view):
+        """
+        Every term must match one of the search fields, matches on the
+        first field rank above the others like the weighted vector
+        """
+        search_fields = self.get_search_fields(view, request)
+        rank = Value(0.0)
+        for term in self.get_search_terms(request):
+            matches = Q()
+            for field in search_fields:
+                matches |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(matches)
+
+            rank += Case(
+                When(**{f'{search_fields[0]}__icontains': term}, then=Value(1.0)),
+                default=Value(0.4),
+                output_field=FloatField()
+            )
+
+        return queryset.annotate(search_rank=rank)
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """
+    Order search results by relevance unless an explicit ordering is requested
+    """
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', *self.get_default_ordering(view)]
+        return super().get_ordering(request, queryset, view)
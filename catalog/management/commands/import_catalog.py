@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from catalog.models import Category, Product
+from catalog.serializers import ProductBulkRowSerializer
+from catalog.services.product_bulk_service import product_bulk_service
+
+PRODUCT_FIELDS = ['id', 'name', 'description', 'price', 'stock_quantity', 'is_active']
+
+class Command(BaseCommand):
+    help = (
+        'Import categories and products from a CSV or JSONL feed. '
+        'Each row has a category path like "Electronics > Phones" and optionally a product. '
+        'Products are matched by id, or by name within their category, and upserted in batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the rows already imported, used to resume an interrupted import'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        checkpoint = options['checkpoint']
+        done = self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f"Resuming after row {done}...")
+
+        # Categories are few compared to products, keep them all in memory
+        self.categories = {category.full_path: category for category in Category.objects.all()}
+        self.created_categories = 0
+
+        started = time.monotonic()
+        resumed_from = done
+        imported = skipped = 0
+
+        with open(path, newline='', encoding='utf-8') as feed:
+            rows = islice(self.read_rows(feed, file_format), done, None)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+
+                with transaction.atomic():
+                    written, errors = self.import_batch(batch, first_line=done + 1)
+
+                for line, error in errors:
+                    self.stderr.write(f"Row {line}: {error}")
+
+                done += len(batch)
+                imported += written
+                skipped += len(errors)
+                self.write_checkpoint(checkpoint, done)
+
+                rate = (done - resumed_from) / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f"Processed {done} rows ({rate:.0f} rows/s)")
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} products and {self.created_categories} new categories, "
+            f"skipped {skipped} invalid rows in {elapsed:.1f}s ({(done - resumed_from) / elapsed:.0f} rows/s)."
+        ))
+
+    def read_rows(self, feed, file_format):
+        """
+        Yield the rows of the feed one at a time, so memory stays flat however long it is
+        """
+        if file_format == 'csv':
+            for row in csv.DictReader(feed):
+                # Empty cells mean the column was not given
+                yield {key: value for key, value in row.items() if key and value not in ('', None)}
+            return
+
+        for number, line in enumerate(feed, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                raise CommandError(f"Line {number} is not valid JSON")
+
+    def read_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as f:
+            return int(f.read().strip() or 0)
+
+    def write_checkpoint(self, checkpoint, done):
+        if not checkpoint:
+            return
+        # Replace atomically so a crash never leaves a truncated checkpoint
+        with open(f'{checkpoint}.tmp', 'w') as f:
+            f.write(str(done))
+        os.replace(f'{checkpoint}.tmp', checkpoint)
+
+    def get_category(self, full_path):
+        """
+        Resolve a category path, creating any missing categories along it
+        """
+        names = [name.strip() for name in full_path.split('>')]
+        if not all(names):
+            raise ValueError(f'Invalid category path "{full_path}"')
+
+        parent = None
+        for depth in range(1, len(names) + 1):
+            key = ' > '.join(names[:depth])
+            category = self.categories.get(key)
+            if category is None:
+                category = Category(name=names[depth - 1], parent=parent)
+                category.save()
+                self.categories[key] = category
+                self.created_categories += 1
+            parent = category
+        return parent
+
+    def import_batch(self, batch, first_line):
+        """
+        Validate a batch with the bulk API rules and upsert it in one transaction
+        """
+        errors = []
+        entries = []
+        for line, row in enumerate(batch, start=first_line):
+            if not isinstance(row, dict):
+                errors.append((line, 'Row must be an object'))
+                continue
+            try:
+                category = self.get_category(str(row.get('category', '')))
+            except ValueError as e:
+                errors.append((line, str(e)))
+                continue
+            # Rows without a product name only declare a category
+            if row.get('name') or row.get('id'):
+                entries.append((line, category, row))
+
+        ids = set()
+        for _, _, row in entries:
+            try:
+                ids.add(int(row['id']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        names = {row['name'] for _, _, row in entries if row.get('name') and not row.get('id')}
+        category_ids = {category.id for _, category, _ in entries}
+
+        # Lock in primary key order so concurrent imports cannot deadlock
+        existing = list(
+            Product.objects.select_for_update(of=('self',)).select_related('category').filter(
+                Q(pk__in=ids) | Q(category_id__in=category_ids, name__in=names)
+            ).order_by('pk')
+        )
+        products = {product.pk: product for product in existing}
+        by_name = {}
+        for product in existing:
+            by_name.setdefault((product.category_id, product.name), product)
+
+        context = {
+            'products': products,
+            'categories': {category.id: category for _, category, _ in entries},
+        }
+
+        rows = {}
+        for line, category, row in entries:
+            data = {field: row[field] for field in PRODUCT_FIELDS if row.get(field) is not None}
+            data['category'] = category.id
+            if 'id' not in data:
+                match = by_name.get((category.id, data.get('name')))
+                if match:
+                    data['id'] = match.pk
+
+            serializer = ProductBulkRowSerializer(data=data, context=context)
+            if not serializer.is_valid():
+                errors.append((line, json.dumps(serializer.errors)))
+                continue
+
+            # A product listed twice in a batch keeps its last row
+            key = serializer.validated_data.get('id') or (category.id, data['name'])
+            rows[key] = serializer.validated_data
+
+        product_bulk_service.apply(list(rows.values()), products)
+        return len(rows), errors
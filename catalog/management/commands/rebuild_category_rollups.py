@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from catalog.services.category_counter_service import category_counter_service
+from catalog.services.category_rollup_service import category_rollup_service
+
+class Command(BaseCommand):
+    help = 'Rebuild the subtree price rollups and the counters of all categories from scratch'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding category price rollups and counters...")
+
+        total = category_rollup_service.rebuild()
+        category_counter_service.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt price rollups and counters for {total} categories."))
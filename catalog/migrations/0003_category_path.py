@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def build_path(pk):
+        # Walk up iteratively so very deep trees don't hit the recursion limit
+        chain = []
+        while pk is not None and pk not in paths:
+            chain.append(pk)
+            pk = parents[pk]
+        prefix = paths[pk] if pk is not None else ''
+        for node in reversed(chain):
+            prefix = paths[node] = f'{prefix}{node}/'
+        return prefix
+
+    categories = list(Category.objects.only('pk'))
+    for category in categories:
+        category.path = build_path(category.pk)
+
+    Category.objects.bulk_update(categories, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_product_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.TextField(blank=True, db_index=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
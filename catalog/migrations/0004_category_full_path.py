@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+def populate_full_paths(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+
+    categories = list(Category.objects.only('pk', 'name', 'path'))
+    names = {category.pk: category.name for category in categories}
+
+    for category in categories:
+        ancestor_ids = [int(pk) for pk in category.path.split('/')[:-1]]
+        category.full_path = ' > '.join(names[pk] for pk in ancestor_ids)
+
+    Category.objects.bulk_update(categories, ['full_path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='full_path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_full_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def build_rollups(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    CategoryPriceRollup = apps.get_model('catalog', 'CategoryPriceRollup')
+    Product = apps.get_model('catalog', 'Product')
+
+    paths = dict(Category.objects.values_list('pk', 'path'))
+    rollups = {pk: CategoryPriceRollup(category_id=pk) for pk in paths}
+
+    direct_totals = Product.objects.filter(is_active=True).order_by().values('category_id').annotate(
+        count=Count('id'), total=Sum('price'), low=Min('price'), high=Max('price')
+    )
+    for row in direct_totals:
+        for pk in paths[row['category_id']].split('/')[:-1]:
+            rollup = rollups[int(pk)]
+            rollup.product_count += row['count']
+            rollup.price_sum += row['total']
+            rollup.min_price = row['low'] if rollup.min_price is None else min(rollup.min_price, row['low'])
+            rollup.max_price = row['high'] if rollup.max_price is None else max(rollup.max_price, row['high'])
+
+    CategoryPriceRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_category_full_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPriceRollup',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_rollup', serialize=False, to='catalog.category')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
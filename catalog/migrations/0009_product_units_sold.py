@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+# Matches the UPPER(name::text) LIKE 'PREFIX%' queries of istartswith
+# on PostgreSQL, other databases scan the few matching rows instead
+CREATE_PREFIX_INDEX_SQL = """
+CREATE INDEX catalog_product_name_prefix_idx ON catalog_product
+    (UPPER(name::text) text_pattern_ops) WHERE is_active;
+"""
+
+DROP_PREFIX_INDEX_SQL = """
+DROP INDEX IF EXISTS catalog_product_name_prefix_idx;
+"""
+
+
+def count_units_sold(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    totals = OrderItem.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    Product.objects.update(units_sold=Coalesce(Subquery(totals), 0))
+
+
+def create_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_PREFIX_INDEX_SQL)
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_PREFIX_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_indexes'),
+        ('orders', '0003_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_units_sold, migrations.RunPython.noop),
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:50
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def count_categories(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    Product = apps.get_model('catalog', 'Product')
+
+    categories = {category.pk: category for category in Category.objects.only('pk')}
+
+    for row in Category.objects.filter(parent__isnull=False).order_by().values('parent_id').annotate(total=Count('id')):
+        categories[row['parent_id']].child_count = row['total']
+
+    product_totals = Product.objects.order_by().values('category_id').annotate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        stock=Sum('stock_quantity', filter=Q(is_active=True)),
+    )
+    for row in product_totals:
+        category = categories[row['category_id']]
+        category.product_count = row['total']
+        category.active_product_count = row['active']
+        category.total_stock = row['stock'] or 0
+
+    Category.objects.bulk_update(
+        categories.values(),
+        ['child_count', 'product_count', 'active_product_count', 'total_stock'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_product_units_sold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='child_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_stock',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_category_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPopularity',
+            fields=[
+                ('score_1d', models.PositiveIntegerField(default=0)),
+                ('score_7d', models.PositiveIntegerField(default=0)),
+                ('score_30d', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='catalog.category')),
+            ],
+            options={
+                'verbose_name_plural': 'category popularities',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPopularity',
+            fields=[
+                ('score_1d', models.PositiveIntegerField(default=0)),
+                ('score_7d', models.PositiveIntegerField(default=0)),
+                ('score_30d', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity_scores', serialize=False, to='catalog.product')),
+            ],
+            options={
+                'verbose_name_plural': 'product popularities',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_item_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-popularity', '-id'], name='product_popularity_idx'),
+        ),
+        migrations.AddField(
+            model_name='productsalesday',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='catalog.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalesday',
+            index=models.Index(fields=['day'], name='product_sales_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesday',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='product_sales_day_unique'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:12
+
+from django.db import migrations
+
+SHARDS = 16
+
+
+def create_catalog_version_shards(apps, schema_editor):
+    CatalogVersion = apps.get_model('catalog', 'CatalogVersion')
+    existing = set(CatalogVersion.objects.values_list('pk', flat=True))
+    CatalogVersion.objects.bulk_create([
+        CatalogVersion(pk=shard) for shard in range(1, SHARDS + 1) if shard not in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_product_reserved_quantity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_catalog_version_shards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from calendar import timegm
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import cache as catalog_cache
+from .models import CatalogVersion
+
+
+class CatalogConditionalGetMixin:
+    """
+    Tag catalog responses with ETag and Last-Modified validators derived
+    from the catalog version, and answer matching conditional GETs
+    with 304 before any product or category query runs
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        # Read the version before the data, so a concurrent write can only make the tag stale
+        catalog_version = CatalogVersion.current()
+        etag = self.get_catalog_etag(request, catalog_version)
+        last_modified = self.get_catalog_last_modified(catalog_version)
+
+        # The ETag is exact, so If-Modified-Since is only honoured when no If-None-Match was sent
+        if request.META.get('HTTP_IF_NONE_MATCH'):
+            response = get_conditional_response(request, etag=etag)
+        else:
+            response = get_conditional_response(request, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+    def get_catalog_last_modified(self, catalog_version):
+        """
+        Timestamp of the last catalog change, or None while its second is not over:
+        Last-Modified has one second resolution, so another write in that second
+        would carry the same date and be answered with a stale 304
+        """
+        last_modified = timegm(catalog_version.updated_at.utctimetuple())
+        if last_modified >= int(time.time()):
+            return None
+        return last_modified
+
+    def get_catalog_etag(self, request, catalog_version):
+        """
+        Strong ETag for this representation of the resource at the current catalog version
+        """
+        representation = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        digest = hashlib.md5(representation.encode(), usedforsecurity=False).hexdigest()[:16]
+        return f'"{catalog_version.version}-{digest}"'
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses per URL and query parameters.
+    Entries are keyed on the generations of `cache_scopes`, formatted with
+    the URL kwargs, so invalidating a scope orphans everything cached under it
+    """
+    cache_scopes = []
+
+    def get_cache_scopes(self):
+        return [scope.format(**self.kwargs) for scope in self.cache_scopes]
+
+    def get(self, request, *args, **kwargs):
+        key = catalog_cache.get_response_key(request, self.get_cache_scopes())
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
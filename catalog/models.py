@@ -1,51 +1,311 @@
-from django.db import models
+import os
+import threading
+
+from django.db import models, transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Concat, Length, Substr
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+
+from .signals import category_moved
 
 User = get_user_model()
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path of ancestor ids, like 1/4/9/
+    path = models.TextField(db_index=True, editable=False, blank=True, default='')
+    # Denormalized display path, like Bakery > Bread > White Bread
+    full_path = models.TextField(editable=False, blank=True, default='')
+    # Counters maintained by CategoryCounterService, only ever changed with F() updates
+    child_count = models.PositiveIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
+    total_stock = models.PositiveBigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    COUNTER_FIELDS = ['child_count', 'product_count', 'active_product_count', 'total_stock']
+    # Only ever written by _refresh_tree, from the stored paths
+    TREE_FIELDS = ['path', 'full_path']
+
     class Meta:
         verbose_name_plural = 'categories'
         ordering = ['name']
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # Never write back possibly stale counters or paths of an existing row
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS + self.TREE_FIELDS
+            ]
+
+        with transaction.atomic(): # Keep the row and its tree fields consistent
+            super().save(*args, **kwargs)
+            self._refresh_tree()
+
+    def _refresh_tree(self):
+        """
+        Sync the materialized and full paths with the current parent and name,
+        cascading any change to the whole subtree in a single UPDATE
+        """
+        # Read stored paths instead of trusting possibly stale instances
+        stored = {
+            pk: (path, full_path)
+            for pk, path, full_path in Category.objects.filter(
+                pk__in=[self.pk, self.parent_id]
+            ).values_list('pk', 'path', 'full_path')
+        }
+        old_path, old_full_path = stored.get(self.pk, ('', ''))
+        parent_path, parent_full_path = stored.get(self.parent_id, ('', '')) if self.parent_id else ('', '')
+
+        new_path = f'{parent_path}{self.pk}/'
+        new_full_path = f'{parent_full_path} > {self.name}' if self.parent_id else self.name
+
+        if (new_path, new_full_path) != (old_path, old_full_path):
+            if old_path:
+                # Renamed or reparented - rewrite the prefixes of this node and all its descendants
+                Category.objects.filter(path__startswith=old_path).update(
+                    path=Concat(
+                        Value(new_path), Substr('path', len(old_path) + 1),
+                        output_field=models.TextField()
+                    ),
+                    full_path=Concat(
+                        Value(new_full_path), Substr('full_path', len(old_full_path) + 1),
+                        output_field=models.TextField()
+                    )
+                )
+            else:
+                Category.objects.filter(pk=self.pk).update(path=new_path, full_path=new_full_path)
+
+        self.path = new_path
+        self.full_path = new_full_path
+
+        if old_path and new_path != old_path:
+            category_moved.send(sender=Category, instance=self, old_path=old_path, new_path=new_path)
     
     def get_full_path(self):
         """
         Returns the full category path
         like Bakery > Bread > White Bread
         """
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        return self.full_path
+
+    def get_ancestor_ids(self):
+        """
+        Get ids of all ancestors from the root down, without querying
+        """
+        return [int(pk) for pk in self.path.split('/')[:-2]]
+
+    def get_ancestors(self):
+        """
+        Get all ancestor categories from the root down in a single query
+        """
+        return Category.objects.filter(pk__in=self.get_ancestor_ids()).order_by(Length('path'))
+
+    def get_descendants(self, include_self=False):
+        """
+        Get all descendant categories in a single query
+        """
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
     
     def get_all_children(self):
         """
         Get all descendant categories
         """
-        children = list(self.children.all())
-        for child in list(children):
-            children.extend(child.get_all_children())
-        return children
+        return list(self.get_descendants())
     
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
+    # Indexed by product_category_created_idx, which leads with the category
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products', db_index=False)
     stock_quantity = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted name/description lexemes, maintained by a database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Units ordered so far
+    units_sold = models.PositiveIntegerField(default=0, editable=False)
+    # Units sold over the last 7 days, refreshed by the popularity job, ranks lists and suggestions
+    popularity = models.PositiveIntegerField(default=0, editable=False)
+    # Units held by live checkout reservations, maintained with F() updates by ReservationService
+    reserved_quantity = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ['units_sold', 'popularity', 'reserved_quantity']
+    # Only ever written by the database trigger
+    TRIGGER_FIELDS = ['search_vector']
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Category filters with the default ordering
+            models.Index(fields=['category', '-created_at'], name='product_category_created_idx'),
+            # Sorts, with the id tiebreaker used by cursor pagination
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['-popularity', '-id'], name='product_popularity_idx'),
+            # Price aggregates only ever read active products
+            models.Index(
+                fields=['category', 'price'], condition=models.Q(is_active=True),
+                name='product_active_price_idx'
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.name} - ${self.price}"
\ No newline at end of file
+        return f"{self.name} - ${self.price}"
+
+    def save(self, *args, **kwargs):
+        # Never write back possibly stale counters or the search vector of an existing row
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS + self.TRIGGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def available_quantity(self):
+        """
+        Stock that is not held by a checkout reservation
+        """
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
+class CategoryPriceRollup(models.Model):
+    """
+    Aggregates of active product prices across a category's whole subtree
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='price_rollup')
+    product_count = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.category} - {self.product_count} products"
+
+    @property
+    def average_price(self):
+        if not self.product_count:
+            return 0
+        return round(self.price_sum / self.product_count, 2)
+
+
+class CatalogVersion(models.Model):
+    """
+    Counter bumped on every product or category change,
+    used to validate cached catalog responses cheaply.
+    It is spread over SHARDS rows so concurrent writers don't queue behind one row lock;
+    the catalog version is the sum of the shards
+    """
+    SHARDS = 16
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+    @classmethod
+    def current(cls):
+        """
+        The catalog version and time of the last change, as an unsaved instance, in one query
+        """
+        totals = cls.objects.aggregate(version=Sum('version'), updated_at=Max('updated_at'))
+        if totals['version'] is None:
+            return cls.objects.get_or_create(pk=1)[0]
+        return cls(**totals)
+
+    @classmethod
+    def bump(cls):
+        # The shard is fixed per process and thread, so a transaction only ever locks one row
+        shard = hash((os.getpid(), threading.get_ident())) % cls.SHARDS + 1
+        updated = cls.objects.filter(pk=shard).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(pk=shard, defaults={'version': 1})
+
+
+class ProductSalesDay(models.Model):
+    """
+    Units of a product sold on a day, folded in from order items by the popularity job
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_days')
+    day = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='product_sales_day_unique'),
+        ]
+        indexes = [
+            # Scores only ever read the last 30 days
+            models.Index(fields=['day'], name='product_sales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.day}: {self.quantity}"
+
+
+class PopularityScores(models.Model):
+    """
+    Units sold over the last 1, 7 and 30 days
+    """
+    score_1d = models.PositiveIntegerField(default=0)
+    score_7d = models.PositiveIntegerField(default=0)
+    score_30d = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SCORE_FIELDS = {'score_1d': 1, 'score_7d': 7, 'score_30d': 30}
+
+    class Meta:
+        abstract = True
+
+
+class ProductPopularity(PopularityScores):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity_scores')
+
+    class Meta:
+        verbose_name_plural = 'product popularities'
+
+    def __str__(self):
+        return f"{self.product_id} - {self.score_7d} sold in 7 days"
+
+
+class CategoryPopularity(PopularityScores):
+    """
+    Scores summed over every product in a category's whole subtree
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+
+    class Meta:
+        verbose_name_plural = 'category popularities'
+
+    def __str__(self):
+        return f"{self.category_id} - {self.score_7d} sold in 7 days"
+
+
+class SalesWatermark(models.Model):
+    """
+    Single row holding the last order item folded into the daily sales
+    """
+    order_item_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Sales aggregated up to order item {self.order_item_id}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.get_or_create(pk=1)[0]
@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as catalog_cache
+from .models import CatalogVersion, Category, CategoryPriceRollup, Product
+from .services.category_counter_service import category_counter_service
+from .services.category_rollup_service import category_rollup_service, path_ids
+from .signals import category_moved, products_bulk_changed
+
+
+def get_category_path(category_id):
+    return Category.objects.filter(pk=category_id).values_list('path', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def create_category_rollup(sender, instance, created, raw=False, **kwargs):
+    """Every category starts with an empty price rollup"""
+    if created and not raw:
+        CategoryPriceRollup.objects.get_or_create(category=instance)
+
+
+@receiver(post_delete, sender=Category)
+def delete_category_rollup(sender, instance, **kwargs):
+    """Products deleted along with the category may have recreated its rollup"""
+    CategoryPriceRollup.objects.filter(category_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Category)
+def count_created_category(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        category_counter_service.parent_changed(None, instance.parent_id)
+
+
+@receiver(post_delete, sender=Category)
+def count_deleted_category(sender, instance, **kwargs):
+    category_counter_service.parent_changed(instance.parent_id, None)
+
+
+@receiver(category_moved, sender=Category)
+def move_category_rollup(sender, instance, old_path, new_path, **kwargs):
+    """Move the subtree totals from the old ancestors to the new ones"""
+    category_rollup_service.move_subtree(old_path, new_path)
+
+    old_ids = path_ids(old_path)
+    new_ids = path_ids(new_path)
+    category_counter_service.parent_changed(
+        old_ids[-2] if len(old_ids) > 1 else None,
+        new_ids[-2] if len(new_ids) > 1 else None,
+    )
+
+
+@receiver(pre_save, sender=Product)
+def capture_previous_product(sender, instance, raw=False, **kwargs):
+    """Remember the stored product state so post_save can apply a delta"""
+    instance._previous_state = None
+    if raw or instance.pk is None:
+        return
+
+    instance._previous_state = Product.objects.filter(pk=instance.pk).values_list(
+        'category_id', 'category__path', 'price', 'is_active', 'stock_quantity'
+    ).first()
+
+
+@receiver(post_save, sender=Product)
+def sync_product_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    old = None
+    old_counted = None
+    old_path = None
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        old_category_id, old_path, old_price, old_is_active, old_stock = previous
+        old_counted = (old_category_id, old_is_active, old_stock)
+        if old_is_active:
+            old = (old_path, old_price)
+
+    # Avoid a lookup when the category did not change
+    if previous and old_category_id == instance.category_id:
+        new_path = old_path
+    else:
+        new_path = get_category_path(instance.category_id)
+
+    new = (new_path, Decimal(str(instance.price))) if instance.is_active else None
+
+    category_rollup_service.product_changed(old, new)
+    category_counter_service.product_changed(
+        old_counted, (instance.category_id, instance.is_active, instance.stock_quantity)
+    )
+    catalog_cache.invalidate_products([instance.pk], [old_path, new_path])
+
+
+@receiver(post_delete, sender=Product)
+def sync_product_delete(sender, instance, **kwargs):
+    path = get_category_path(instance.category_id)
+
+    if path and instance.is_active:
+        category_rollup_service.product_changed((path, Decimal(str(instance.price))), None)
+    if path:
+        category_counter_service.product_changed(
+            (instance.category_id, instance.is_active, instance.stock_quantity), None
+        )
+    catalog_cache.invalidate_products([instance.pk], [path])
+
+
+@receiver(products_bulk_changed, sender=Product)
+def sync_bulk_product_changes(sender, changes, **kwargs):
+    """Apply the side effects the per-row signals would have, once per batch"""
+    def rollup_state(state):
+        if state and state[2]:
+            return (state[0], state[1])
+        return None
+
+    def counter_state(state):
+        if state:
+            return (path_ids(state[0])[-1], state[2], state[3])
+        return None
+
+    category_rollup_service.apply_changes(
+        [(rollup_state(old), rollup_state(new)) for _, old, new in changes]
+    )
+    category_counter_service.apply_changes(
+        [(counter_state(old), counter_state(new)) for _, old, new in changes]
+    )
+
+    paths = {state[0] for _, old, new in changes for state in (old, new) if state}
+    catalog_cache.invalidate_products([pk for pk, _, _ in changes], paths)
+    CatalogVersion.bump()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, raw=False, **kwargs):
+    if not raw:
+        catalog_cache.invalidate('categories')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version(sender, raw=False, **kwargs):
+    """Invalidate the validators of every catalog response"""
+    if not raw:
+        CatalogVersion.bump()
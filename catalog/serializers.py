@@ -1,13 +1,23 @@
 from rest_framework import serializers
+
+from core.fieldsets import SparseFieldsetSerializerMixin
+
 from .models import Category, Product
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     children = serializers.StringRelatedField(many=True, read_only=True)
-    full_path = serializers.ReadOnlyField(source='get_full_path')
+    full_path = serializers.ReadOnlyField()
+    subtree_product_count = serializers.IntegerField(
+        source='price_rollup.product_count', read_only=True, default=0
+    )
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'parent', 'children', 'full_path']
+        fields = [
+            'id', 'name', 'parent', 'children', 'full_path',
+            'child_count', 'product_count', 'active_product_count',
+            'subtree_product_count', 'total_stock',
+        ]
 
     def validate_parent(self, value):
         """
@@ -16,28 +26,29 @@ class CategorySerializer(serializers.ModelSerializer):
         if not value or not self.instance:
             return value
 
-        # Check if new value is a descendant of this category
-        if value in self.instance.get_all_children():
-            raise serializers.ValidationError(
-                'Cannot set parent as this would cause circular reference'
-            )
-        
         # Prevent self reference
         if value.pk == self.instance.pk:
             raise serializers.ValidationError(
                 'A category cannot be its own parent'
             )
+
+        # Check if new value is a descendant of this category, by walking
+        # the ancestors stored in its materialized path instead of the subtree
+        if self.instance.pk in value.get_ancestor_ids():
+            raise serializers.ValidationError(
+                'Cannot set parent as this would cause circular reference'
+            )
         
         return value
     
 class ProductCategorySerializer(serializers.ModelSerializer):
-    full_path = serializers.ReadOnlyField(source='get_full_path')
+    full_path = serializers.ReadOnlyField()
 
     class Meta:
         model = Category
         fields = ['id', 'name', 'full_path']
     
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
@@ -48,7 +59,8 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['category'] = ProductCategorySerializer(instance.category).data # replace with detailed data
+        if 'category' in data:
+            data['category'] = ProductCategorySerializer(instance.category).data # replace with detailed data
         return data
 
     def validate_price(self, value):
@@ -59,4 +71,67 @@ class ProductSerializer(serializers.ModelSerializer):
     def validate_stock_quantity(self, value):
         if value <= 0:
             raise serializers.ValidationError('Stock quantity cannot be negative')
-        return value
\ No newline at end of file
+        return value
+
+class ProductSuggestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price']
+
+
+class ProductBulkRowSerializer(ProductSerializer):
+    """
+    A single upsert of a bulk write. Rows with an id update that product
+    with the fields they carry, rows without one create a product.
+    Products and categories are looked up in maps preloaded by the view
+    """
+    id = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False)
+
+    create_required_fields = ['name', 'price', 'category']
+
+    class Meta(ProductSerializer.Meta):
+        extra_kwargs = {
+            'name': {'required': False},
+            'price': {'required': False},
+        }
+
+    def validate_id(self, value):
+        if value not in self.context['products']:
+            raise serializers.ValidationError('Product with the given ID does not exist')
+        return value
+
+    def validate_category(self, value):
+        category = self.context['categories'].get(value)
+        if category is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return category
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            missing = [field for field in self.create_required_fields if field not in attrs]
+            if missing:
+                raise serializers.ValidationError({field: ['This field is required.'] for field in missing})
+        return attrs
+
+
+class ProductBulkSerializer(serializers.Serializer):
+    max_rows = 10000
+
+    upserts = ProductBulkRowSerializer(many=True, required=False, max_length=max_rows)
+    deactivate = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=max_rows
+    )
+
+    def validate_deactivate(self, value):
+        missing = [pk for pk in value if pk not in self.context['products']]
+        if missing:
+            raise serializers.ValidationError(
+                f"Products with the given IDs do not exist: {', '.join(map(str, missing))}"
+            )
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('upserts') and not attrs.get('deactivate'):
+            raise serializers.ValidationError('Provide products to upsert or deactivate')
+        return attrs
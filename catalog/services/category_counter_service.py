@@ -0,0 +1,106 @@
+import logging
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from catalog.models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryCounterService:
+    """
+    Service class for maintaining the child, product and stock counters of categories
+    """
+    def product_changed(self, old, new):
+        """
+        Apply a single product change, where old and new are
+        (category_id, is_active, stock_quantity) of the product, or None
+        """
+        self.apply_changes([(old, new)])
+
+    def apply_changes(self, changes):
+        """
+        Apply a batch of (old, new) product changes in one UPDATE
+        """
+        deltas = {}
+        for old, new in changes:
+            if old == new:
+                continue
+            if old:
+                self._collect(deltas, old, -1)
+            if new:
+                self._collect(deltas, new, 1)
+
+        self._write(deltas)
+
+    def parent_changed(self, old_parent_id, new_parent_id):
+        """
+        Move a category from one parent's child count to another's
+        """
+        deltas = {}
+        if old_parent_id:
+            deltas.setdefault(old_parent_id, Counter())['child_count'] -= 1
+        if new_parent_id:
+            deltas.setdefault(new_parent_id, Counter())['child_count'] += 1
+
+        self._write(deltas)
+
+    def rebuild(self):
+        """
+        Recompute the counters of every category from scratch
+        """
+        categories = {pk: Category(pk=pk) for pk in Category.objects.values_list('pk', flat=True)}
+
+        for row in Category.objects.filter(parent__isnull=False).order_by().values('parent_id').annotate(total=Count('id')):
+            categories[row['parent_id']].child_count = row['total']
+
+        product_totals = Product.objects.order_by().values('category_id').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            stock=Sum('stock_quantity', filter=Q(is_active=True)),
+        )
+        for row in product_totals:
+            category = categories[row['category_id']]
+            category.product_count = row['total']
+            category.active_product_count = row['active']
+            category.total_stock = row['stock'] or 0
+
+        with transaction.atomic():
+            Category.objects.bulk_update(categories.values(), Category.COUNTER_FIELDS, batch_size=1000)
+
+        logger.info(f"Rebuilt counters for {len(categories)} categories")
+        return len(categories)
+
+    def _collect(self, deltas, state, sign):
+        category_id, is_active, stock_quantity = state
+        delta = deltas.setdefault(category_id, Counter())
+        delta['product_count'] += sign
+        if is_active:
+            delta['active_product_count'] += sign
+            delta['total_stock'] += sign * stock_quantity
+
+    def _write(self, deltas):
+        """
+        Lock the affected categories in a deterministic order and apply the deltas in one UPDATE
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta.values())}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            ids = list(
+                Category.objects.select_for_update().filter(pk__in=deltas.keys()).order_by('pk').values_list('pk', flat=True)
+            )
+
+            updates = {}
+            for field in Category.COUNTER_FIELDS:
+                whens = [When(pk=pk, then=Value(delta[field])) for pk, delta in deltas.items() if delta[field]]
+                if whens:
+                    updates[field] = F(field) + Case(*whens, default=Value(0), output_field=models.BigIntegerField())
+
+            Category.objects.filter(pk__in=ids).update(**updates)
+
+
+category_counter_service = CategoryCounterService()
@@ -0,0 +1,247 @@
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from catalog.models import Category, CategoryPriceRollup, Product
+
+logger = logging.getLogger(__name__)
+
+
+def path_ids(path):
+    """
+    Get the ids encoded in a materialized path, from the root down
+    """
+    return [int(pk) for pk in path.split('/')[:-1]]
+
+
+class RollupDelta:
+    """
+    Pending change to a single category rollup
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.total = Decimal('0')
+        self.added_min = None
+        self.added_max = None
+        self.removed_min = None
+        self.removed_max = None
+
+    def add(self, count, total, low, high):
+        self.count += count
+        self.total += total
+        self.added_min = low if self.added_min is None else min(self.added_min, low)
+        self.added_max = high if self.added_max is None else max(self.added_max, high)
+
+    def remove(self, count, total, low, high):
+        self.count -= count
+        self.total -= total
+        self.removed_min = low if self.removed_min is None else min(self.removed_min, low)
+        self.removed_max = high if self.removed_max is None else max(self.removed_max, high)
+
+
+class CategoryRollupService:
+    """
+    Service class for maintaining subtree price rollups of categories
+    """
+    def product_changed(self, old, new):
+        """
+        Apply a single product change, where old and new are
+        (category_path, price) of the active product, or None
+        """
+        self.apply_changes([(old, new)])
+
+    def apply_changes(self, changes):
+        """
+        Apply a batch of (old, new) product changes in one pass
+        """
+        deltas = {}
+        for old, new in changes:
+            if old == new:
+                continue
+            if old:
+                path, price = old
+                self._collect(deltas, path, 'remove', 1, price, price, price)
+            if new:
+                path, price = new
+                self._collect(deltas, path, 'add', 1, price, price, price)
+
+        self._write(deltas)
+
+    def move_subtree(self, old_path, new_path):
+        """
+        Move the rollup of a reparented category from its old ancestors to its new ones
+        """
+        root_id = path_ids(new_path)[-1]
+        rollup = CategoryPriceRollup.objects.filter(pk=root_id).first()
+        if not rollup or not rollup.product_count:
+            return
+
+        # The moved category's own rollup is unchanged, only its ancestors are affected
+        old_parent_path = old_path[:-len(f'{root_id}/')]
+        new_parent_path = new_path[:-len(f'{root_id}/')]
+        totals = (rollup.product_count, rollup.price_sum, rollup.min_price, rollup.max_price)
+
+        deltas = {}
+        if old_parent_path:
+            self._collect(deltas, old_parent_path, 'remove', *totals)
+        if new_parent_path:
+            self._collect(deltas, new_parent_path, 'add', *totals)
+
+        self._write(deltas)
+
+    def rebuild(self):
+        """
+        Recompute every category rollup from scratch
+        """
+        paths = dict(Category.objects.values_list('pk', 'path'))
+        rollups = {pk: CategoryPriceRollup(category_id=pk) for pk in paths}
+
+        # One grouped query for the direct totals, folded into every ancestor in memory
+        direct_totals = Product.objects.filter(is_active=True).order_by().values('category_id').annotate(
+            count=Count('id'), total=Sum('price'), low=Min('price'), high=Max('price')
+        )
+        for row in direct_totals:
+            for pk in path_ids(paths[row['category_id']]):
+                rollup = rollups[pk]
+                rollup.product_count += row['count']
+                rollup.price_sum += row['total']
+                rollup.min_price = row['low'] if rollup.min_price is None else min(rollup.min_price, row['low'])
+                rollup.max_price = row['high'] if rollup.max_price is None else max(rollup.max_price, row['high'])
+
+        with transaction.atomic():
+            CategoryPriceRollup.objects.bulk_create(
+                rollups.values(),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['category'],
+                update_fields=['product_count', 'price_sum', 'min_price', 'max_price'],
+            )
+
+        logger.info(f"Rebuilt price rollups for {len(rollups)} categories")
+        return len(rollups)
+
+    def _collect(self, deltas, path, action, count, total, low, high):
+        """
+        Record a change against a category and all of its ancestors
+        """
+        ids = path.split('/')[:-1]
+        for depth in range(1, len(ids) + 1):
+            pk = int(ids[depth - 1])
+            if pk not in deltas:
+                deltas[pk] = RollupDelta('/'.join(ids[:depth]) + '/')
+            getattr(deltas[pk], action)(count, total, low, high)
+
+    def _write(self, deltas):
+        """
+        Lock the affected rollups in a deterministic order and apply the deltas.
+        Categories without a rollup get one computed from their products instead
+        """
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            rollups = list(
+                CategoryPriceRollup.objects.select_for_update().filter(pk__in=deltas.keys()).order_by('pk')
+            )
+            missing = deltas.keys() - {rollup.pk for rollup in rollups}
+            if missing:
+                self._create_missing(missing, deltas)
+
+            stale = []
+            for rollup in rollups:
+                delta = deltas[rollup.pk]
+                rollup.product_count = max(rollup.product_count + delta.count, 0)
+                rollup.price_sum += delta.total
+
+                if not rollup.product_count:
+                    rollup.price_sum = 0
+                    rollup.min_price = rollup.max_price = None
+                elif self._extreme_removed(rollup, delta):
+                    # The current min or max may be gone, recompute it below
+                    stale.append(rollup)
+                else:
+                    if delta.added_min is not None:
+                        rollup.min_price = min(p for p in [rollup.min_price, delta.added_min] if p is not None)
+                        rollup.max_price = max(p for p in [rollup.max_price, delta.added_max] if p is not None)
+
+            if stale:
+                self._recompute_extremes(stale, deltas)
+
+            CategoryPriceRollup.objects.bulk_update(
+                rollups, ['product_count', 'price_sum', 'min_price', 'max_price'], batch_size=1000
+            )
+
+    def _extreme_removed(self, rollup, delta):
+        if delta.removed_min is None:
+            return False
+        return (
+            rollup.min_price is None or delta.removed_min <= rollup.min_price
+            or rollup.max_price is None or delta.removed_max >= rollup.max_price
+        )
+
+    def _create_missing(self, missing, deltas):
+        """
+        Create the rollups of categories that have none, like bulk created or raw loaded ones,
+        from their active products in a single query. The products already include
+        the change being applied, so no delta applies to these
+        """
+        paths = {pk: deltas[pk].path for pk in missing}
+
+        aggregates = {}
+        for pk, path in paths.items():
+            in_subtree = Q(category__path__startswith=path)
+            aggregates[f'count_{pk}'] = Count('id', filter=in_subtree)
+            aggregates[f'total_{pk}'] = Sum('price', filter=in_subtree)
+            aggregates[f'min_{pk}'] = Min('price', filter=in_subtree)
+            aggregates[f'max_{pk}'] = Max('price', filter=in_subtree)
+
+        totals = Product.objects.filter(self._outermost(paths.values()), is_active=True).aggregate(**aggregates)
+
+        CategoryPriceRollup.objects.bulk_create(
+            [
+                CategoryPriceRollup(
+                    category_id=pk,
+                    product_count=totals[f'count_{pk}'],
+                    price_sum=totals[f'total_{pk}'] or 0,
+                    min_price=totals[f'min_{pk}'],
+                    max_price=totals[f'max_{pk}'],
+                )
+                for pk in paths
+            ],
+            ignore_conflicts=True,
+        )
+        logger.warning(f"Created missing price rollups of categories {sorted(missing)}")
+
+    def _outermost(self, paths):
+        """
+        Filter on the outermost of several subtrees, nested ones are covered by them
+        """
+        outermost = Q()
+        for path in paths:
+            if not any(path != other and path.startswith(other) for other in paths):
+                outermost |= Q(category__path__startswith=path)
+        return outermost
+
+    def _recompute_extremes(self, rollups, deltas):
+        """
+        Recompute min and max prices of several subtrees in a single query
+        """
+        paths = {rollup.pk: deltas[rollup.pk].path for rollup in rollups}
+
+        aggregates = {}
+        for pk, path in paths.items():
+            in_subtree = Q(category__path__startswith=path)
+            aggregates[f'min_{pk}'] = Min('price', filter=in_subtree)
+            aggregates[f'max_{pk}'] = Max('price', filter=in_subtree)
+
+        extremes = Product.objects.filter(self._outermost(paths.values()), is_active=True).aggregate(**aggregates)
+
+        for rollup in rollups:
+            rollup.min_price = extremes[f'min_{rollup.pk}']
+            rollup.max_price = extremes[f'max_{rollup.pk}']
+
+
+category_rollup_service = CategoryRollupService()
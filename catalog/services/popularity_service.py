@@ -0,0 +1,209 @@
+import logging
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from catalog import cache as catalog_cache
+from catalog.models import (
+    CatalogVersion, CategoryPopularity, PopularityScores, Product,
+    ProductPopularity, ProductSalesDay, SalesWatermark,
+)
+from catalog.services.category_rollup_service import path_ids
+from orders.models import OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityService:
+    """
+    Service class for ranking products and categories by recent sales.
+    Order items are folded incrementally into daily sales, and the rolling
+    1, 7 and 30 day scores are recomputed from those days only.
+    The days in the scoring window are reconciled with the order items on every run,
+    so orders cancelled after they were folded stop counting
+    """
+    # Items are only folded once every item before them has surely committed
+    settle_delay = timedelta(minutes=5)
+    batch_size = 1000
+
+    def refresh(self):
+        aggregated = self.aggregate_sales()
+        self.reconcile_sales()
+        products, categories = self.refresh_scores()
+        return aggregated, products, categories
+
+    def aggregate_sales(self):
+        """
+        Add the order items created since the watermark to the daily sales.
+        Returns the number of order items folded in
+        """
+        with transaction.atomic():
+            watermark = SalesWatermark.objects.select_for_update().get(pk=SalesWatermark.current().pk)
+
+            # Ids are handed out in insert order, so everything up to the last settled item is complete
+            upper = OrderItem.objects.filter(
+                id__gt=watermark.order_item_id,
+                order__created_at__lt=timezone.now() - self.settle_delay,
+            ).aggregate(upper=Max('id'))['upper']
+            if upper is None:
+                return 0
+
+            items = OrderItem.objects.filter(
+                id__gt=watermark.order_item_id, id__lte=upper
+            ).exclude(order__status='cancelled')
+            sold = {
+                (row['product_id'], row['day']): row['quantity']
+                for row in items.annotate(day=TruncDate('order__created_at')).order_by().values(
+                    'product_id', 'day'
+                ).annotate(quantity=Sum('quantity'))
+            }
+            count = OrderItem.objects.filter(id__gt=watermark.order_item_id, id__lte=upper).count()
+
+            if sold:
+                days = ProductSalesDay.objects.filter(
+                    product_id__in={product_id for product_id, _ in sold},
+                    day__in={day for _, day in sold},
+                )
+                for sales_day in days:
+                    key = (sales_day.product_id, sales_day.day)
+                    if key in sold:
+                        sold[key] += sales_day.quantity
+
+                ProductSalesDay.objects.bulk_create(
+                    [
+                        ProductSalesDay(product_id=product_id, day=day, quantity=quantity)
+                        for (product_id, day), quantity in sold.items()
+                    ],
+                    update_conflicts=True, unique_fields=['product', 'day'], update_fields=['quantity'],
+                    batch_size=self.batch_size,
+                )
+
+            watermark.order_item_id = upper
+            watermark.updated_at = timezone.now()
+            watermark.save()
+
+        logger.info(f"Aggregated {count} order items up to {upper}")
+        return count
+
+    def reconcile_sales(self, today=None):
+        """
+        Recompute the daily sales of the scoring window from the order items already folded in,
+        writing only the days that changed, such as those of orders cancelled since.
+        Returns the number of daily sales rows corrected
+        """
+        today = today or timezone.localdate()
+        oldest = today - timedelta(days=max(PopularityScores.SCORE_FIELDS.values()) - 1)
+
+        with transaction.atomic():
+            watermark = SalesWatermark.objects.select_for_update().get(pk=SalesWatermark.current().pk)
+
+            items = OrderItem.objects.filter(
+                id__lte=watermark.order_item_id,
+                order__created_at__gte=timezone.make_aware(datetime.combine(oldest, time.min)),
+            ).exclude(order__status='cancelled')
+            sold = {
+                (row['product_id'], row['day']): row['quantity']
+                for row in items.annotate(day=TruncDate('order__created_at')).order_by().values(
+                    'product_id', 'day'
+                ).annotate(quantity=Sum('quantity'))
+            }
+
+            changed = []
+            emptied = []
+            for sales_day in ProductSalesDay.objects.filter(day__gte=oldest).only('product_id', 'day', 'quantity'):
+                quantity = sold.pop((sales_day.product_id, sales_day.day), 0)
+                if not quantity:
+                    emptied.append(sales_day.pk)
+                elif quantity != sales_day.quantity:
+                    sales_day.quantity = quantity
+                    changed.append(sales_day)
+
+            ProductSalesDay.objects.filter(pk__in=emptied).delete()
+            ProductSalesDay.objects.bulk_update(changed, ['quantity'], batch_size=self.batch_size)
+            # Whatever is left was sold but never folded in
+            ProductSalesDay.objects.bulk_create(
+                [
+                    ProductSalesDay(product_id=product_id, day=day, quantity=quantity)
+                    for (product_id, day), quantity in sold.items()
+                ],
+                batch_size=self.batch_size,
+            )
+
+        corrected = len(emptied) + len(changed) + len(sold)
+        if corrected:
+            logger.info(f"Reconciled {corrected} daily sales since {oldest}")
+        return corrected
+
+    def refresh_scores(self, today=None):
+        """
+        Recompute the rolling scores of every product sold in the last 30 days
+        and of their categories' subtrees, dropping the scores that fell to zero.
+        Returns the number of scored products and categories
+        """
+        today = today or timezone.localdate()
+        starts = {
+            field: today - timedelta(days=days - 1) for field, days in PopularityScores.SCORE_FIELDS.items()
+        }
+        oldest = min(starts.values())
+
+        rows = ProductSalesDay.objects.filter(day__gte=oldest, day__lte=today).order_by().values(
+            'product_id', 'product__category__path'
+        ).annotate(**{
+            field: Sum('quantity', filter=Q(day__gte=start)) for field, start in starts.items()
+        })
+
+        product_scores = {}
+        category_scores = {}
+        for row in rows:
+            scores = Counter({field: row[field] or 0 for field in starts})
+            product_scores[row['product_id']] = scores
+            for category_id in path_ids(row['product__category__path']):
+                category_scores.setdefault(category_id, Counter()).update(scores)
+
+        with transaction.atomic():
+            self._write_scores(ProductPopularity, 'product_id', product_scores)
+            self._write_scores(CategoryPopularity, 'category_id', category_scores)
+            self._write_popularity(product_scores)
+
+        logger.info(f"Scored {len(product_scores)} products and {len(category_scores)} categories")
+        return len(product_scores), len(category_scores)
+
+    def _write_scores(self, model, key, scores):
+        """
+        Upsert the scores, then drop the rows this run did not touch
+        """
+        started = timezone.now()
+        model.objects.bulk_create(
+            [model(**{key: pk}, **counts) for pk, counts in scores.items()],
+            update_conflicts=True, unique_fields=[key.removesuffix('_id')],
+            update_fields=[*PopularityScores.SCORE_FIELDS, 'updated_at'],
+            batch_size=self.batch_size,
+        )
+        model.objects.filter(updated_at__lt=started).delete()
+
+    def _write_popularity(self, product_scores):
+        """
+        Copy the 7 day scores to the indexed product column, writing only the products that changed
+        """
+        target = {pk: scores['score_7d'] for pk, scores in product_scores.items()}
+        current = Product.objects.filter(
+            Q(pk__in=target.keys()) | Q(popularity__gt=0)
+        ).values_list('pk', 'popularity')
+
+        changed = [
+            Product(pk=pk, popularity=target.get(pk, 0))
+            for pk, popularity in current if popularity != target.get(pk, 0)
+        ]
+        if not changed:
+            return
+
+        Product.objects.bulk_update(changed, ['popularity'], batch_size=self.batch_size)
+        catalog_cache.invalidate('products')
+        CatalogVersion.bump()
+
+
+popularity_service = PopularityService()
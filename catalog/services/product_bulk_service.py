@@ -0,0 +1,108 @@
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from catalog.models import Product
+from catalog.signals import products_bulk_changed
+
+
+class ProductBulkService:
+    """
+    Service class for writing batches of products with bulk queries
+    """
+    batch_size = 1000
+
+    def get_state(self, product):
+        return (product.category.path, product.price, product.is_active, product.stock_quantity)
+
+    def apply(self, rows, existing, deactivate_ids=()):
+        """
+        Create or update products from validated rows and deactivate products, in one transaction.
+        Rows with an id update that product with the fields they carry, rows without one are created.
+        `existing` maps every updated or deactivated id to its (locked) product
+        """
+        now = timezone.now()
+        created = []
+        updated = {}
+        previous = {}
+        fields = {'updated_at'}
+
+        for row in rows:
+            row = dict(row)
+            pk = row.pop('id', None)
+            if pk is None:
+                created.append(Product(**row))
+                continue
+
+            product = existing[pk]
+            previous.setdefault(pk, self.get_state(product))
+            for field, value in row.items():
+                setattr(product, field, value)
+            fields.update(row)
+            updated[pk] = product
+
+        for pk in deactivate_ids:
+            product = existing[pk]
+            previous.setdefault(pk, self.get_state(product))
+            product.is_active = False
+            fields.add('is_active')
+            updated[pk] = product
+
+        with transaction.atomic():
+            Product.objects.bulk_create(created, batch_size=self.batch_size)
+
+            for product in updated.values():
+                product.updated_at = now
+            Product.objects.bulk_update(updated.values(), sorted(fields), batch_size=self.batch_size)
+
+            changes = [(product.pk, None, self.get_state(product)) for product in created]
+            changes.extend(
+                (pk, previous[pk], self.get_state(product)) for pk, product in updated.items()
+            )
+            products_bulk_changed.send(sender=Product, changes=changes)
+
+        return created, list(updated.values())
+
+    def record_sales(self, products, quantities, reserved=False):
+        """
+        Take sold units off the stock of active products and count them as sold, in one UPDATE.
+        `quantities` maps product ids to units sold, `products` maps them to their products.
+        With `reserved`, the units were held by a reservation and are released from it in the same
+        UPDATE, so each product row is written once per sale.
+        Returns False, having sent nothing, when a product was deactivated or no longer has the stock;
+        the caller must then roll back its transaction.
+        products_bulk_changed is sent inside that transaction, so the category counters
+        and the catalog version commit or roll back with the sale
+        """
+        previous = {pk: self.get_state(products[pk]) for pk in quantities}
+        sold = Case(
+            *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+            default=Value(0), output_field=models.IntegerField()
+        )
+        filters = {'stock_quantity__gte': sold}
+        updates = {
+            'stock_quantity': F('stock_quantity') - sold,
+            'units_sold': F('units_sold') + sold,
+            'updated_at': timezone.now(),
+        }
+        if reserved:
+            filters['reserved_quantity__gte'] = sold
+            updates['reserved_quantity'] = F('reserved_quantity') - sold
+
+        with transaction.atomic():
+            updated = Product.objects.filter(pk__in=quantities.keys(), is_active=True, **filters).update(**updates)
+            if updated != len(quantities):
+                return False
+
+            for pk, quantity in quantities.items():
+                products[pk].stock_quantity -= quantity
+                products[pk].units_sold += quantity
+                if reserved:
+                    products[pk].reserved_quantity -= quantity
+
+            products_bulk_changed.send(sender=Product, changes=[
+                (pk, previous[pk], self.get_state(products[pk])) for pk in quantities
+            ])
+        return True
+
+product_bulk_service = ProductBulkService()
@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+from catalog.services.category_rollup_service import path_ids
+
+
+class ProductFacetService:
+    """
+    Service class for counting a filtered product queryset by facet,
+    with one grouped query per facet
+    """
+    # Lower bounds of the price ranges, the last one is open ended
+    price_buckets = [Decimal('0.00'), Decimal('50.00'), Decimal('100.00'), Decimal('500.00'), Decimal('1000.00')]
+
+    def get_facets(self, queryset):
+        queryset = queryset.order_by()
+        return {
+            'categories': self.get_category_counts(queryset),
+            **self.get_price_and_stock_counts(queryset),
+        }
+
+    def get_category_counts(self, queryset):
+        """
+        Products per category, with the subtree totals rolled up along the materialized paths
+        """
+        rows = queryset.values('category_id', 'category__path').annotate(total=Count('pk'))
+
+        counts = {}
+        for row in rows:
+            ids = path_ids(row['category__path'])
+            for pk in ids:
+                counts.setdefault(pk, {'id': pk, 'count': 0, 'subtree_count': 0})
+                counts[pk]['subtree_count'] += row['total']
+            counts[ids[-1]]['count'] += row['total']
+
+        return sorted(counts.values(), key=lambda facet: facet['id'])
+
+    def get_price_and_stock_counts(self, queryset):
+        """
+        Price range and stock counts, as conditional aggregates of one query
+        """
+        ranges = list(zip(self.price_buckets, self.price_buckets[1:] + [None]))
+
+        aggregates = {
+            'in_stock': Count('pk', filter=Q(stock_quantity__gt=0)),
+            'out_of_stock': Count('pk', filter=Q(stock_quantity=0)),
+        }
+        for index, (low, high) in enumerate(ranges):
+            in_range = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+            aggregates[f'price_{index}'] = Count('pk', filter=in_range)
+
+        totals = queryset.aggregate(**aggregates)
+
+        return {
+            'price_ranges': [
+                {'min': str(low), 'max': str(high) if high is not None else None, 'count': totals[f'price_{index}']}
+                for index, (low, high) in enumerate(ranges)
+            ],
+            'stock': {'in_stock': totals['in_stock'], 'out_of_stock': totals['out_of_stock']},
+        }
+
+
+product_facet_service = ProductFacetService()
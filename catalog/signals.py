@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent after a category and its subtree were moved under a new parent.
+# Provides instance, old_path and new_path arguments.
+category_moved = Signal()
+
+# Sent after products were written with bulk queries, which skip the per-row model signals.
+# Provides a changes argument: (product_id, old, new) tuples, where old and new are
+# (category_path, price, is_active, stock_quantity) of the product, or None when it did not exist.
+products_bulk_changed = Signal()
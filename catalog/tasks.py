@@ -0,0 +1,19 @@
+import logging
+
+from celery import shared_task
+from .services.popularity_service import popularity_service
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def refresh_popularity():
+    """
+    Fold new order items into the daily sales and recompute the popularity scores
+    """
+    aggregated, products, categories = popularity_service.refresh()
+    logger.info(f"Popularity refreshed: {aggregated} new order items, {products} products, {categories} categories")
+    return {
+        'order_items': aggregated,
+        'products': products,
+        'categories': categories,
+    }
@@ -1,11 +1,28 @@
 from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+import csv
+import json
+import os
+import tempfile
 
-from catalog.models import Category, Product
+from catalog.models import CatalogVersion, Category, CategoryPopularity, CategoryPriceRollup, Product, ProductPopularity, ProductSalesDay
+from catalog.services.popularity_service import popularity_service
+from catalog.tasks import refresh_popularity
+from orders.models import Order, OrderItem
+from catalog.serializers import CategorySerializer
 
 User = get_user_model()
 
@@ -48,6 +65,84 @@ class CategoryModelTestCase(TestCase):
         children = self.sub_sub_category.get_all_children()
         self.assertEqual(len(children), 0)
 
+    def test_save_stale_instance_after_ancestor_moved(self):
+        """Test saving a stale descendant keeps the stored path and does not move it again"""
+        other_root = Category.objects.create(name='Gadgets')
+        Product.objects.create(name='Pixel', price=Decimal('500.00'), category=self.sub_sub_category)
+        stale = Category.objects.get(pk=self.sub_sub_category.pk)
+
+        self.sub_category.parent = other_root
+        self.sub_category.save()
+
+        stale.name = 'Android Phones'
+        stale.save()
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.path, f'{other_root.pk}/{self.sub_category.pk}/{stale.pk}/')
+        self.assertEqual(stale.full_path, 'Gadgets > Mobile Phones > Android Phones')
+        self.assertEqual(CategoryPriceRollup.objects.get(category=other_root).product_count, 1)
+        self.assertEqual(CategoryPriceRollup.objects.get(category=self.root_category).product_count, 0)
+
+    def test_path_is_set_on_create(self):
+        """Test materialized path is maintained on create"""
+        expected_path = f'{self.root_category.pk}/{self.sub_category.pk}/{self.sub_sub_category.pk}/'
+        self.sub_sub_category.refresh_from_db()
+        self.assertEqual(self.sub_sub_category.path, expected_path)
+
+    def test_get_all_children_uses_single_query(self):
+        """Test descendants are fetched in a single query"""
+        with self.assertNumQueries(1):
+            children = self.root_category.get_all_children()
+        self.assertEqual(len(children), 2)
+
+    def test_get_ancestors(self):
+        """Test ancestors are returned from the root down"""
+        with self.assertNumQueries(1):
+            ancestors = list(self.sub_sub_category.get_ancestors())
+        self.assertEqual(ancestors, [self.root_category, self.sub_category])
+
+    def test_reparent_cascades_to_descendants(self):
+        """Test moving a category rewrites the paths of its whole subtree"""
+        new_root = Category.objects.create(name='Gadgets')
+        self.sub_category.parent = new_root
+        self.sub_category.save()
+
+        self.sub_sub_category.refresh_from_db()
+        self.assertEqual(
+            self.sub_sub_category.path,
+            f'{new_root.pk}/{self.sub_category.pk}/{self.sub_sub_category.pk}/'
+        )
+        self.assertEqual(self.root_category.get_all_children(), [])
+        self.assertCountEqual(new_root.get_all_children(), [self.sub_category, self.sub_sub_category])
+
+    def test_get_full_path_is_stored(self):
+        """Test full path is read from the stored column without queries"""
+        category = Category.objects.get(pk=self.sub_sub_category.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(category.get_full_path(), 'Electronics > Mobile Phones > Smartphones')
+
+    def test_rename_cascades_full_path(self):
+        """Test renaming a category refreshes the full paths of its descendants"""
+        self.root_category.name = 'Devices'
+        self.root_category.save()
+
+        self.sub_sub_category.refresh_from_db()
+        self.assertEqual(self.sub_sub_category.full_path, 'Devices > Mobile Phones > Smartphones')
+
+    def test_reparent_cascades_full_path(self):
+        """Test moving a category refreshes the full paths of its subtree"""
+        new_root = Category.objects.create(name='Gadgets')
+        self.sub_category.parent = new_root
+        self.sub_category.save()
+
+        self.sub_sub_category.refresh_from_db()
+        self.assertEqual(self.sub_sub_category.full_path, 'Gadgets > Mobile Phones > Smartphones')
+
+    def test_delete_removes_subtree_from_index(self):
+        """Test deleting a category drops its descendants from the tree"""
+        self.sub_category.delete()
+        self.assertEqual(self.root_category.get_all_children(), [])
+
 class ProductModelTestCase(TestCase):
     def setUp(self):
         """Set up test data"""
@@ -71,6 +166,166 @@ class ProductModelTestCase(TestCase):
         self.assertIsNotNone(self.product.created_at)
         self.assertIsNotNone(self.product.updated_at)
 
+class CategoryPriceRollupTestCase(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.root = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.root)
+        self.laptops = Category.objects.create(name='Laptops', parent=self.root)
+
+        self.phone = Product.objects.create(
+            name='iPhone 15', price=Decimal('1000.00'), category=self.phones, stock_quantity=5
+        )
+        self.laptop = Product.objects.create(
+            name='MacBook Pro', price=Decimal('2000.00'), category=self.laptops, stock_quantity=5
+        )
+
+    def get_rollup(self, category):
+        return CategoryPriceRollup.objects.get(category=category)
+
+    def assertRollup(self, category, count, total, low, high):
+        rollup = self.get_rollup(category)
+        self.assertEqual(rollup.product_count, count)
+        self.assertEqual(rollup.price_sum, Decimal(total))
+        self.assertEqual(rollup.min_price, Decimal(low) if low else None)
+        self.assertEqual(rollup.max_price, Decimal(high) if high else None)
+
+    def test_rollup_on_create(self):
+        """Test product creation updates the whole ancestor chain"""
+        self.assertRollup(self.root, 2, '3000.00', '1000.00', '2000.00')
+        self.assertRollup(self.phones, 1, '1000.00', '1000.00', '1000.00')
+
+    def test_rollup_on_price_update(self):
+        """Test price changes adjust sum and extremes"""
+        self.laptop.price = Decimal('500.00')
+        self.laptop.save()
+
+        self.assertRollup(self.root, 2, '1500.00', '500.00', '1000.00')
+        self.assertRollup(self.laptops, 1, '500.00', '500.00', '500.00')
+
+    def test_rollup_on_soft_delete(self):
+        """Test deactivating a product removes it from the rollups"""
+        self.laptop.is_active = False
+        self.laptop.save()
+
+        self.assertRollup(self.root, 1, '1000.00', '1000.00', '1000.00')
+        self.assertRollup(self.laptops, 0, '0.00', None, None)
+
+    def test_rollup_on_category_change(self):
+        """Test moving a product between categories"""
+        self.laptop.category = self.phones
+        self.laptop.save()
+
+        self.assertRollup(self.root, 2, '3000.00', '1000.00', '2000.00')
+        self.assertRollup(self.phones, 2, '3000.00', '1000.00', '2000.00')
+        self.assertRollup(self.laptops, 0, '0.00', None, None)
+
+    def test_rollup_on_reparent(self):
+        """Test reparenting a category moves its totals between ancestors"""
+        computers = Category.objects.create(name='Computers')
+        self.laptops.parent = computers
+        self.laptops.save()
+
+        self.assertRollup(self.root, 1, '1000.00', '1000.00', '1000.00')
+        self.assertRollup(computers, 1, '2000.00', '2000.00', '2000.00')
+
+    def test_missing_rollup_is_created(self):
+        """Test categories without a rollup get one from their products instead of losing the change"""
+        CategoryPriceRollup.objects.filter(category__in=[self.root, self.laptops]).delete()
+
+        Product.objects.create(name='ThinkPad', price=Decimal('1500.00'), category=self.laptops, stock_quantity=5)
+
+        self.assertRollup(self.root, 3, '4500.00', '1000.00', '2000.00')
+        self.assertRollup(self.laptops, 2, '3500.00', '1500.00', '2000.00')
+
+        # Deleting a category deletes the rollup its products' deletion recreated
+        laptops_id = self.laptops.pk
+        self.laptops.delete()
+        self.assertFalse(CategoryPriceRollup.objects.filter(category=laptops_id).exists())
+        self.assertRollup(self.root, 1, '1000.00', '1000.00', '1000.00')
+
+    def test_rebuild_command(self):
+        """Test rebuilding the rollups from scratch"""
+        CategoryPriceRollup.objects.update(product_count=0, price_sum=0, min_price=None, max_price=None)
+
+        call_command('rebuild_category_rollups', stdout=StringIO())
+
+        self.assertRollup(self.root, 2, '3000.00', '1000.00', '2000.00')
+        self.assertRollup(self.laptops, 1, '2000.00', '2000.00', '2000.00')
+
+class CategoryCounterTestCase(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.root = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.root)
+        self.laptops = Category.objects.create(name='Laptops', parent=self.root)
+
+        self.phone = Product.objects.create(
+            name='iPhone 15', price=Decimal('1000.00'), category=self.phones, stock_quantity=5
+        )
+        self.other_phone = Product.objects.create(
+            name='Pixel 8', price=Decimal('700.00'), category=self.phones, stock_quantity=3
+        )
+
+    def assertCounters(self, category, child_count, product_count, active_product_count, total_stock):
+        category = Category.objects.get(pk=category.pk)
+        self.assertEqual(
+            (category.child_count, category.product_count, category.active_product_count, category.total_stock),
+            (child_count, product_count, active_product_count, total_stock)
+        )
+
+    def test_counters_on_create(self):
+        """Test creating categories and products updates the counters"""
+        self.assertCounters(self.root, 2, 0, 0, 0)
+        self.assertCounters(self.phones, 0, 2, 2, 8)
+
+    def test_counters_on_product_update(self):
+        """Test stock changes, deactivation and moves keep the counters in sync"""
+        self.phone.stock_quantity = 2
+        self.phone.save()
+        self.assertCounters(self.phones, 0, 2, 2, 5)
+
+        self.other_phone.is_active = False
+        self.other_phone.save()
+        self.assertCounters(self.phones, 0, 2, 1, 2)
+
+        self.phone.category = self.laptops
+        self.phone.save()
+        self.assertCounters(self.phones, 0, 1, 0, 0)
+        self.assertCounters(self.laptops, 0, 1, 1, 2)
+
+    def test_counters_on_delete(self):
+        """Test deleting products and categories decrements the counters"""
+        self.phone.delete()
+        self.laptops.delete()
+
+        self.assertCounters(self.phones, 0, 1, 1, 3)
+        self.assertCounters(self.root, 1, 0, 0, 0)
+
+    def test_counters_on_reparent(self):
+        """Test reparenting a category moves it between child counts"""
+        self.laptops.parent = self.phones
+        self.laptops.save()
+
+        self.assertCounters(self.root, 1, 0, 0, 0)
+        self.assertCounters(self.phones, 1, 2, 2, 8)
+
+    def test_save_keeps_counters(self):
+        """Test saving a stale category instance does not overwrite its counters"""
+        self.phones.name = 'Mobile Phones'
+        self.phones.save()
+
+        self.assertCounters(self.phones, 0, 2, 2, 8)
+
+    def test_rebuild_command(self):
+        """Test rebuilding the counters from scratch"""
+        Category.objects.update(child_count=0, product_count=0, active_product_count=0, total_stock=0)
+
+        call_command('rebuild_category_rollups', stdout=StringIO())
+
+        self.assertCounters(self.root, 2, 0, 0, 0)
+        self.assertCounters(self.phones, 0, 2, 2, 8)
+
 class CategoryAPITestCase(APITestCase):
     def setUp(self):
         """Set up test data and authentication"""
@@ -199,6 +454,78 @@ class CategoryAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data['data']['name'], 'Smart Devices')
         
+    def test_reparent_under_descendant_should_fail(self):
+        """Test moving a category under its own descendant is rejected"""
+        self.authenticate_admin()
+        grandchild = Category.objects.create(name='Android', parent=self.child_category)
+
+        response = self.client.patch(
+            f'/api/v1/catalog/categories/{self.parent_category.id}/',
+            {'parent': grandchild.id}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('circular reference', str(response.json()['errors']))
+
+    def test_reparent_under_self_should_fail(self):
+        """Test a category cannot be its own parent"""
+        self.authenticate_admin()
+
+        response = self.client.patch(
+            f'/api/v1/catalog/categories/{self.child_category.id}/',
+            {'parent': self.child_category.id}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('own parent', str(response.json()['errors']))
+
+    def test_cycle_check_does_not_load_subtree(self):
+        """Test the cycle check costs no queries, however large the subtree"""
+        parent = self.parent_category
+        for depth in range(5):
+            parent = Category.objects.create(name=f'Level {depth}', parent=parent)
+        books = Category.objects.create(name='Books')
+        serializer = CategorySerializer(instance=self.parent_category)
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValidationError):
+                serializer.validate_parent(parent)
+            self.assertEqual(serializer.validate_parent(books), books)
+
+    def test_category_counters_in_response(self):
+        """Test categories expose their maintained counters"""
+        with self.assertNumQueries(3): # catalog version + category + children
+            response = self.client.get(f'/api/v1/catalog/categories/{self.parent_category.id}/')
+        data = response.json()['data']
+
+        self.assertEqual(data['child_count'], 1)
+        self.assertEqual(data['product_count'], 0)
+        self.assertEqual(data['subtree_product_count'], 2)
+
+    def test_cached_category_counters_follow_products(self):
+        """Test cached category responses are refreshed when their products change"""
+        cache.clear()
+        url = f'/api/v1/catalog/categories/{self.child_category.id}/'
+        self.client.get(url)
+        self.client.get('/api/v1/catalog/categories/')
+
+        Product.objects.create(name='Pixel 8', price=Decimal('699.99'), category=self.child_category, stock_quantity=1)
+
+        self.assertEqual(self.client.get(url).json()['data']['product_count'], 3)
+        listed = {
+            category['id']: category for category in self.client.get('/api/v1/catalog/categories/').json()['data']['results']
+        }
+        self.assertEqual(listed[self.child_category.id]['product_count'], 3)
+
+    def test_delete_category_with_children_should_fail(self):
+        """Test deleting a category that has subcategories (should fail)"""
+        self.authenticate_admin()
+
+        response = self.client.delete(f'/api/v1/catalog/categories/{self.parent_category.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Category.objects.filter(pk=self.parent_category.pk).exists())
+
     def test_delete_category_with_products_should_fail(self):
         """Test deleting category that has products (should fail)"""
         self.authenticate_admin()
@@ -226,12 +553,82 @@ class CategoryAPITestCase(APITestCase):
         self.assertEqual(data['data']['average_price'], expected_avg)
         self.assertEqual(data['data']['total_products'], 2)
 
+    def test_category_average_price_includes_subtree(self):
+        """Test average price covers descendants in a single query"""
+        with self.assertNumQueries(2): # catalog version + rollup
+            response = self.client.get(
+                f'/api/v1/catalog/categories/{self.parent_category.id}/average-price/'
+            )
+        data = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['data']['average_price'], 899.99)
+        self.assertEqual(data['data']['min_price'], 799.99)
+        self.assertEqual(data['data']['max_price'], 999.99)
+        self.assertEqual(data['data']['total_products'], 2)
+
     def test_category_average_price_nonexistent_category(self):
         """Test average price for non-existent category"""
         response = self.client.get('/api/v1/catalog/categories/99999/average-price/')
         
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class CategoryTreeAPITestCase(APITestCase):
+    def setUp(self):
+        """Set up a small category tree"""
+        cache.clear()
+
+        self.electronics = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.electronics)
+        self.laptops = Category.objects.create(name='Laptops', parent=self.electronics)
+        self.smartphones = Category.objects.create(name='Smartphones', parent=self.phones)
+        self.books = Category.objects.create(name='Books')
+
+        Product.objects.create(
+            name='iPhone 15', price=Decimal('999.99'), category=self.smartphones, stock_quantity=5
+        )
+        Product.objects.create(
+            name='Old Phone', price=Decimal('99.99'), category=self.phones, stock_quantity=5, is_active=False
+        )
+
+    def test_tree_is_assembled_in_one_query(self):
+        """Test the whole hierarchy is loaded in a single query"""
+        with self.assertNumQueries(2): # catalog version + categories
+            response = self.client.get('/api/v1/catalog/categories/tree/')
+        roots = response.json()['data']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([root['name'] for root in roots], ['Books', 'Electronics'])
+
+        electronics = roots[1]
+        self.assertEqual([child['name'] for child in electronics['children']], ['Laptops', 'Phones'])
+
+        phones = electronics['children'][1]
+        self.assertEqual(phones['children'][0]['full_path'], 'Electronics > Phones > Smartphones')
+        self.assertNotIn('product_count', phones)
+
+    def test_tree_with_product_counts(self):
+        """Test per-node active product counts cover the subtree"""
+        response = self.client.get('/api/v1/catalog/categories/tree/?include_counts=true')
+        roots = response.json()['data']
+
+        books, electronics = roots
+        self.assertEqual(books['product_count'], 0)
+        self.assertEqual(electronics['product_count'], 1)
+        self.assertEqual(electronics['children'][1]['product_count'], 1)
+
+    def test_tree_is_cached_until_categories_change(self):
+        """Test the tree is served as a single cached document"""
+        self.client.get('/api/v1/catalog/categories/tree/')
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/catalog/categories/tree/')
+
+        Category.objects.create(name='Toys')
+
+        response = self.client.get('/api/v1/catalog/categories/tree/')
+        self.assertEqual(len(response.json()['data']), 3)
+
 class ProductAPITestCase(APITestCase):
     def setUp(self):
         """Set up test data"""
@@ -389,6 +786,27 @@ class ProductAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(data['data']['results']), 1)
 
+    def test_product_filtering_by_category_tree(self):
+        """Test filtering by a category includes products anywhere in its subtree"""
+        phones = Category.objects.create(name='Phones', parent=self.category)
+        android = Category.objects.create(name='Android', parent=phones)
+        Product.objects.create(name='Pixel 8', price=Decimal('699.99'), category=android, stock_quantity=5)
+        Product.objects.create(name='Dune', price=Decimal('12.00'), category=Category.objects.create(name='Books'), stock_quantity=5)
+
+        response = self.client.get(f'/api/v1/catalog/products/?category_tree={self.category.id}&ordering=name')
+        names = [result['name'] for result in response.json()['data']['results']]
+        self.assertEqual(names, ['Pixel 8', 'iPhone 15'])
+
+        response = self.client.get(f'/api/v1/catalog/products/?category_tree={phones.id}&search=pixel&ordering=name&pagination=cursor')
+        names = [result['name'] for result in response.json()['data']['results']]
+        self.assertEqual(names, ['Pixel 8'])
+
+    def test_product_filtering_by_unknown_category_tree(self):
+        """Test filtering by a missing category is rejected"""
+        response = self.client.get('/api/v1/catalog/products/?category_tree=999')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_product_search(self):
         """Test searching products by name"""
         response = self.client.get('/api/v1/catalog/products/?search=iPhone')
@@ -398,6 +816,57 @@ class ProductAPITestCase(APITestCase):
         self.assertEqual(len(data['data']['results']), 1)
         self.assertIn('iPhone', data['data']['results'][0]['name'])
 
+    def test_product_search_ranks_name_matches_first(self):
+        """Test search results are ordered by relevance"""
+        Product.objects.create(
+            name='Phone Case',
+            description='Fits the iPhone 15',
+            price=Decimal('19.99'),
+            category=self.category,
+            stock_quantity=5
+        )
+
+        response = self.client.get('/api/v1/catalog/products/?search=iPhone')
+        results = response.json()['data']['results']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['name'] for result in results], ['iPhone 15', 'Phone Case'])
+
+    def test_product_search_requires_every_term(self):
+        """Test every search term has to match"""
+        response = self.client.get('/api/v1/catalog/products/?search=iPhone android')
+        data = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['data']['results']), 0)
+
+    def test_product_search_with_explicit_ordering(self):
+        """Test an explicit ordering overrides relevance"""
+        Product.objects.create(
+            name='Phone Case',
+            description='Fits the iPhone 15',
+            price=Decimal('19.99'),
+            category=self.category,
+            stock_quantity=5
+        )
+
+        response = self.client.get('/api/v1/catalog/products/?search=iPhone&ordering=price')
+        results = response.json()['data']['results']
+
+        self.assertEqual([result['name'] for result in results], ['Phone Case', 'iPhone 15'])
+
+    def test_save_leaves_search_vector_to_trigger(self):
+        """Test saving a product neither loads nor writes its search vector"""
+        product = Product.objects.defer('search_vector').get(pk=self.product.pk)
+        product.name = 'iPhone 16'
+
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+
+        self.assertFalse([query for query in queries if 'search_vector' in query['sql']])
+        response = self.client.get('/api/v1/catalog/products/?search=iPhone 16')
+        self.assertEqual(len(response.json()['data']['results']), 1)
+
     def test_product_ordering_by_price(self):
         """Test ordering products by price"""
         # Create another product
@@ -415,4 +884,781 @@ class ProductAPITestCase(APITestCase):
         self.assertEqual(len(data['data']['results']), 2)
         
         # First product should be the cheaper one
-        self.assertEqual(data['data']['results'][0]['name'], 'Cheap Phone')
\ No newline at end of file
+        self.assertEqual(data['data']['results'][0]['name'], 'Cheap Phone')
+
+class ProductQueryCountTestCase(APITestCase):
+    def setUp(self):
+        """Set up a deep category tree with products at every level"""
+        self.categories = []
+        parent = None
+        for depth in range(6):
+            parent = Category.objects.create(name=f'Level {depth}', parent=parent)
+            self.categories.append(parent)
+
+    def create_products(self, total):
+        for index in range(total):
+            Product.objects.create(
+                name=f'Product {index}',
+                price=Decimal('10.00'),
+                category=self.categories[index % len(self.categories)],
+                stock_quantity=5
+            )
+
+    def test_product_list_query_count_is_constant(self):
+        """Test a page of products costs the same number of queries regardless of size"""
+        self.create_products(2)
+        with self.assertNumQueries(3): # catalog version + count + page
+            self.client.get('/api/v1/catalog/products/')
+
+        self.create_products(10)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/catalog/products/')
+
+        results = response.json()['data']['results']
+        self.assertEqual(len(results), 10)
+        self.assertTrue(any(
+            result['category']['full_path'] == ' > '.join(f'Level {depth}' for depth in range(6))
+            for result in results
+        ))
+
+    def test_product_detail_query_count(self):
+        """Test product detail loads the product and its category in one query"""
+        self.create_products(1)
+        product = Product.objects.get()
+
+        with self.assertNumQueries(2): # catalog version + product
+            response = self.client.get(f'/api/v1/catalog/products/{product.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['category']['id'], product.category_id)
+
+class ProductSparseFieldsetTestCase(APITestCase):
+    def setUp(self):
+        """Set up a few products"""
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics')
+        for index in range(3):
+            Product.objects.create(
+                name=f'Product {index}',
+                description='A long description',
+                price=Decimal('10.00') + index,
+                category=self.category,
+                stock_quantity=5
+            )
+
+    def test_fields_narrow_output_and_columns(self):
+        """Test ?fields= keeps only the requested fields and loads only their columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/catalog/products/?fields=id,name,price,stock_quantity')
+
+        results = response.json()['data']['results']
+        self.assertEqual(set(results[0]), {'id', 'name', 'price', 'stock_quantity'})
+
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('description', page_query)
+        self.assertNotIn('catalog_category', page_query)
+
+    def test_omit_fields(self):
+        """Test ?omit= drops fields and keeps the nested category when asked for"""
+        response = self.client.get('/api/v1/catalog/products/?omit=description,created_at,updated_at')
+        result = response.json()['data']['results'][0]
+
+        self.assertNotIn('description', result)
+        self.assertEqual(result['category']['name'], 'Electronics')
+
+    def test_fields_with_cursor_pagination(self):
+        """Test cursor pages read their ordering value even when it is not returned"""
+        for index in range(10):
+            Product.objects.create(name=f'Extra {index}', price=Decimal('50.00'), category=self.category, stock_quantity=1)
+
+        with self.assertNumQueries(2): # catalog version + page
+            response = self.client.get('/api/v1/catalog/products/?fields=id&ordering=price&pagination=cursor')
+        following = self.client.get(response.json()['data']['next'])
+
+        self.assertEqual(len(following.json()['data']['results']), 3)
+
+    def test_fields_on_detail(self):
+        """Test product detail honours ?fields="""
+        product = Product.objects.first()
+        response = self.client.get(f'/api/v1/catalog/products/{product.id}/?fields=name')
+
+        self.assertEqual(response.json()['data'], {'name': product.name})
+
+    def test_unknown_fields(self):
+        """Test unknown fields are rejected"""
+        response = self.client.get('/api/v1/catalog/products/?fields=name,secret')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ProductCursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        """Set up more products than fit on a page"""
+        self.category = Category.objects.create(name='Electronics')
+        for index in range(15):
+            Product.objects.create(
+                name=f'Product {index:02}',
+                price=Decimal(100 - index % 5),
+                category=self.category,
+                stock_quantity=5
+            )
+
+    def get_names(self, response):
+        return [result['name'] for result in response.json()['data']['results']]
+
+    def test_cursor_pages_without_count(self):
+        """Test cursor pages are a single query without a total count"""
+        with self.assertNumQueries(2): # catalog version + page
+            response = self.client.get('/api/v1/catalog/products/?pagination=cursor')
+        data = response.json()['data']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNone(data['previous'])
+        self.assertIsNotNone(data['next'])
+
+    def test_cursor_walks_forwards_and_backwards(self):
+        """Test following next and previous links visits every product once"""
+        first = self.client.get('/api/v1/catalog/products/?pagination=cursor&ordering=price')
+        second = self.client.get(first.json()['data']['next'])
+        back = self.client.get(second.json()['data']['previous'])
+
+        expected = list(Product.objects.order_by('price', 'pk').values_list('name', flat=True))
+        self.assertEqual(self.get_names(first) + self.get_names(second), expected)
+        self.assertIsNone(second.json()['data']['next'])
+        self.assertEqual(self.get_names(back), self.get_names(first))
+        self.assertIsNone(back.json()['data']['previous'])
+
+    def test_cursor_with_search(self):
+        """Test search results are walked by relevance in cursor mode"""
+        Product.objects.create(name='Phone', description='Product', price=Decimal('10.00'), category=self.category)
+
+        first = self.client.get('/api/v1/catalog/products/?pagination=cursor&search=Product')
+        second = self.client.get(first.json()['data']['next'])
+        back = self.client.get(second.json()['data']['previous'])
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        names = self.get_names(first) + self.get_names(second)
+        # Name matches rank above the description match, latest first within a rank
+        expected = [f'Product {index:02}' for index in reversed(range(15))] + ['Phone']
+        self.assertEqual(names, expected)
+        self.assertIsNone(second.json()['data']['next'])
+        self.assertEqual(self.get_names(back), self.get_names(first))
+
+        response = self.client.get('/api/v1/catalog/products/?pagination=cursor&search=Product&fields=id,name')
+        self.assertEqual(self.get_names(response), self.get_names(first))
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get('/api/v1/catalog/products/?pagination=cursor&cursor=garbage')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ProductBulkAPITestCase(APITestCase):
+    def setUp(self):
+        """Set up an admin and existing products"""
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            user_type='admin',
+            is_staff=True
+        )
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.electronics = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.electronics)
+        self.product = Product.objects.create(
+            name='iPhone 15',
+            price=Decimal('900.00'),
+            category=self.phones,
+            stock_quantity=10
+        )
+        self.other = Product.objects.create(
+            name='Pixel 8',
+            price=Decimal('700.00'),
+            category=self.phones,
+            stock_quantity=10
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def new_rows(self, total):
+        return [
+            {'name': f'Case {index}', 'price': '10.00', 'category': self.phones.id, 'stock_quantity': 5}
+            for index in range(total)
+        ]
+
+    def test_bulk_upsert_and_deactivate(self):
+        """Test a batch creates, updates and deactivates products"""
+        data = {
+            'upserts': [
+                {'name': 'Galaxy S24', 'price': '800.00', 'category': self.phones.id, 'stock_quantity': 3},
+                {'id': self.product.id, 'price': '950.00'},
+            ],
+            'deactivate': [self.other.id],
+        }
+        response = self.client.post('/api/v1/catalog/products/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()['data']
+        self.assertEqual(len(result['created']), 1)
+        self.assertEqual(result['updated'], [self.product.id])
+        self.assertEqual(result['deactivated'], [self.other.id])
+
+        self.product.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('950.00'))
+        self.assertEqual(self.product.name, 'iPhone 15')
+        self.assertFalse(self.other.is_active)
+        self.assertTrue(Product.objects.filter(pk=result['created'][0], name='Galaxy S24').exists())
+
+        # Rollups follow the bulk write like they follow single saves
+        rollup = CategoryPriceRollup.objects.get(category=self.electronics)
+        self.assertEqual(rollup.product_count, 2)
+        self.assertEqual(rollup.min_price, Decimal('800.00'))
+        self.assertEqual(rollup.max_price, Decimal('950.00'))
+
+    def test_bulk_reports_errors_per_row(self):
+        """Test an invalid row rejects the whole batch and is reported at its index"""
+        data = {
+            'upserts': [
+                {'name': 'Galaxy S24', 'price': '800.00', 'category': self.phones.id, 'stock_quantity': 3},
+                {'name': 'Broken', 'price': '-1.00', 'category': 999},
+                {'price': '10.00'},
+            ],
+        }
+        response = self.client.post('/api/v1/catalog/products/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['errors']['upserts']
+        self.assertEqual(errors[0], {})
+        self.assertIn('price', errors[1])
+        self.assertIn('category', errors[1])
+        self.assertIn('name', errors[2])
+        self.assertFalse(Product.objects.filter(name='Galaxy S24').exists())
+
+    def test_bulk_unknown_products(self):
+        """Test updating or deactivating missing products fails"""
+        data = {'upserts': [{'id': 999, 'price': '10.00'}], 'deactivate': [998]}
+        response = self.client.post('/api/v1/catalog/products/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['errors']
+        self.assertIn('id', errors['upserts'][0])
+        self.assertIn('deactivate', errors)
+
+    def test_bulk_query_count_is_constant(self):
+        """Test a batch costs the same number of queries regardless of its size"""
+        rows = self.new_rows(5) + [{'id': self.product.id, 'stock_quantity': 20}]
+        with self.assertNumQueries(17):
+            self.client.post('/api/v1/catalog/products/bulk/', {'upserts': rows}, format='json')
+
+        rows = self.new_rows(50) + [{'id': self.product.id, 'stock_quantity': 30}, {'id': self.other.id, 'name': 'Pixel 8a'}]
+        with self.assertNumQueries(17):
+            response = self.client.post('/api/v1/catalog/products/bulk/', {'upserts': rows}, format='json')
+
+        self.assertEqual(len(response.json()['data']['created']), 50)
+        self.assertEqual(CategoryPriceRollup.objects.get(category=self.electronics).product_count, 57)
+
+    def test_bulk_invalidates_cached_product(self):
+        """Test cached product responses are refreshed after a bulk update"""
+        cache.clear()
+        url = f'/api/v1/catalog/products/{self.product.id}/'
+        self.client.get(url)
+
+        self.client.post(
+            '/api/v1/catalog/products/bulk/',
+            {'upserts': [{'id': self.product.id, 'name': 'iPhone 15 Pro'}]},
+            format='json'
+        )
+
+        self.assertEqual(self.client.get(url).json()['data']['name'], 'iPhone 15 Pro')
+
+    def test_bulk_as_customer(self):
+        """Test customers cannot write products in bulk"""
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post('/api/v1/catalog/products/bulk/', {'deactivate': [self.product.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ProductFacetTestCase(APITestCase):
+    def setUp(self):
+        """Set up products across a small tree and price ranges"""
+        cache.clear()
+        self.electronics = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.electronics)
+        self.books = Category.objects.create(name='Books')
+        for name, price, category, stock in [
+            ('Pixel 8', '700.00', self.phones, 5),
+            ('iPhone 15', '999.99', self.phones, 0),
+            ('Cable', '9.99', self.electronics, 20),
+            ('Dune', '12.00', self.books, 3),
+        ]:
+            Product.objects.create(name=name, price=Decimal(price), category=category, stock_quantity=stock)
+
+    def test_list_with_facets(self):
+        """Test facets count categories with subtree totals, price ranges and stock"""
+        response = self.client.get('/api/v1/catalog/products/?facets=true')
+        facets = response.json()['data']['facets']
+
+        categories = {facet['id']: facet for facet in facets['categories']}
+        self.assertEqual(categories[self.electronics.id], {'id': self.electronics.id, 'count': 1, 'subtree_count': 3})
+        self.assertEqual(categories[self.phones.id], {'id': self.phones.id, 'count': 2, 'subtree_count': 2})
+        self.assertEqual(categories[self.books.id]['count'], 1)
+
+        counts = {facet['min']: facet['count'] for facet in facets['price_ranges']}
+        self.assertEqual(counts, {'0.00': 2, '50.00': 0, '100.00': 0, '500.00': 2, '1000.00': 0})
+        self.assertEqual(facets['stock'], {'in_stock': 3, 'out_of_stock': 1})
+
+    def test_facets_follow_filters(self):
+        """Test facets are computed over the filtered products only"""
+        response = self.client.get(f'/api/v1/catalog/products/?facets=true&category={self.phones.id}')
+        facets = response.json()['data']['facets']
+
+        self.assertEqual(facets['stock'], {'in_stock': 1, 'out_of_stock': 1})
+        self.assertEqual(
+            {facet['id'] for facet in facets['categories']}, {self.electronics.id, self.phones.id}
+        )
+
+    def test_facets_are_cached_across_pages(self):
+        """Test facets cost two queries once, then are shared by other pages and orderings"""
+        with self.assertNumQueries(5): # catalog version + count + page + 2 facets
+            self.client.get('/api/v1/catalog/products/?facets=true')
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/catalog/products/?facets=true&ordering=price')
+
+        self.assertIn('facets', response.json()['data'])
+
+    def test_list_without_facets(self):
+        """Test facets are only computed on request"""
+        response = self.client.get('/api/v1/catalog/products/')
+
+        self.assertNotIn('facets', response.json()['data'])
+
+class ProductSuggestAPITestCase(APITestCase):
+    def setUp(self):
+        """Set up products with different popularity"""
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics')
+        for name, popularity, is_active in [
+            ('iPhone 15', 10, True),
+            ('iPhone 15 Pro', 50, True),
+            ('iPad Air', 5, True),
+            ('iPhone 12', 100, False),
+            ('Pixel 8', 80, True),
+        ]:
+            product = Product.objects.create(
+                name=name, price=Decimal('500.00'), category=self.category, stock_quantity=5, is_active=is_active
+            )
+            Product.objects.filter(pk=product.pk).update(popularity=popularity)
+
+    def get_names(self, response):
+        return [suggestion['name'] for suggestion in response.json()['data']]
+
+    def test_suggest_by_prefix_and_popularity(self):
+        """Test suggestions match the name prefix of active products, most popular first"""
+        with self.assertNumQueries(2): # catalog version + suggestions
+            response = self.client.get('/api/v1/catalog/products/suggest/?q=iph')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_names(response), ['iPhone 15 Pro', 'iPhone 15'])
+        self.assertEqual(set(response.json()['data'][0]), {'id', 'name', 'price'})
+
+    def test_suggest_limit(self):
+        """Test the number of suggestions can be limited"""
+        response = self.client.get('/api/v1/catalog/products/suggest/?q=i&limit=1')
+
+        self.assertEqual(self.get_names(response), ['iPhone 15 Pro'])
+
+    def test_suggest_without_query(self):
+        """Test an empty query suggests nothing"""
+        response = self.client.get('/api/v1/catalog/products/suggest/?q=')
+
+        self.assertEqual(response.json()['data'], [])
+
+class ProductPopularityTestCase(APITestCase):
+    def setUp(self):
+        """Set up products in a category tree and a customer"""
+        cache.clear()
+        self.electronics = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.electronics)
+        self.laptops = Category.objects.create(name='Laptops', parent=self.electronics)
+        self.phone = Product.objects.create(name='iPhone 15', price=Decimal('999.99'), category=self.phones, stock_quantity=50)
+        self.laptop = Product.objects.create(name='MacBook', price=Decimal('1999.99'), category=self.laptops, stock_quantity=50)
+        self.tablet = Product.objects.create(name='iPad', price=Decimal('499.99'), category=self.electronics, stock_quantity=50)
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+
+    def place_order(self, days_ago, *lines, status='confirmed'):
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal('0.00'), status=status)
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        # Orders must have settled before they are aggregated
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago, minutes=10))
+
+    def test_refresh_scores_products_and_subtrees(self):
+        """Test the rolling scores of products and category subtrees"""
+        self.place_order(0, (self.phone, 2), (self.laptop, 1))
+        self.place_order(3, (self.phone, 3))
+        self.place_order(20, (self.laptop, 4))
+        self.place_order(40, (self.tablet, 9))
+        self.place_order(0, (self.tablet, 5), status='cancelled')
+
+        result = refresh_popularity()
+
+        self.assertEqual(result, {'order_items': 6, 'products': 2, 'categories': 3})
+        phone = ProductPopularity.objects.get(product=self.phone)
+        self.assertEqual((phone.score_1d, phone.score_7d, phone.score_30d), (2, 5, 5))
+        electronics = CategoryPopularity.objects.get(category=self.electronics)
+        self.assertEqual((electronics.score_1d, electronics.score_7d, electronics.score_30d), (3, 6, 10))
+        self.assertFalse(ProductPopularity.objects.filter(product=self.tablet).exists())
+
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.popularity, 5)
+
+    def test_refresh_is_incremental(self):
+        """Test order items are aggregated once, and unsettled orders wait for the next run"""
+        self.place_order(0, (self.phone, 2))
+        refresh_popularity()
+
+        self.place_order(0, (self.phone, 1))
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal('0.00'))
+        OrderItem.objects.create(order=order, product=self.laptop, quantity=7, price=self.laptop.price)
+        result = refresh_popularity()
+
+        self.assertEqual(result['order_items'], 1)
+        self.assertEqual(ProductSalesDay.objects.get(product=self.phone).quantity, 3)
+        self.assertFalse(ProductSalesDay.objects.filter(product=self.laptop).exists())
+
+    def test_cancelled_after_aggregation(self):
+        """Test an order cancelled after it was aggregated stops counting within the window"""
+        self.place_order(0, (self.phone, 2))
+        self.place_order(2, (self.phone, 3), (self.laptop, 1))
+        refresh_popularity()
+
+        Order.objects.filter(items__product=self.laptop).update(status='cancelled')
+        refresh_popularity()
+
+        self.assertEqual(sorted(ProductSalesDay.objects.values_list('quantity', flat=True)), [2])
+        phone = ProductPopularity.objects.get(product=self.phone)
+        self.assertEqual((phone.score_1d, phone.score_7d), (2, 2))
+        self.assertFalse(ProductPopularity.objects.filter(product=self.laptop).exists())
+        self.assertEqual(CategoryPopularity.objects.get(category=self.electronics).score_30d, 2)
+
+    def test_order_by_popularity(self):
+        """Test products can be listed and paginated by popularity"""
+        self.place_order(0, (self.laptop, 4), (self.tablet, 1))
+        refresh_popularity()
+
+        response = self.client.get('/api/v1/catalog/products/?ordering=-popularity')
+        names = [product['name'] for product in response.json()['data']['results']]
+        self.assertEqual(names, ['MacBook', 'iPad', 'iPhone 15'])
+
+        response = self.client.get('/api/v1/catalog/products/?ordering=-popularity&pagination=cursor')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['data']['results'][0]['name'], 'MacBook')
+
+    def test_scores_expire(self):
+        """Test scores drop once their sales leave the window"""
+        self.place_order(0, (self.phone, 2))
+        refresh_popularity()
+
+        popularity_service.refresh_scores(today=timezone.localdate() + timedelta(days=31))
+
+        self.assertFalse(ProductPopularity.objects.exists())
+        self.assertFalse(CategoryPopularity.objects.exists())
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.popularity, 0)
+
+class ProductExportAPITestCase(APITestCase):
+    def setUp(self):
+        """Set up products in two categories and an admin"""
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            user_type='admin',
+            is_staff=True
+        )
+        self.electronics = Category.objects.create(name='Electronics')
+        self.books = Category.objects.create(name='Books')
+        for index in range(3):
+            Product.objects.create(
+                name=f'Phone {index}',
+                price=Decimal('100.00'),
+                category=self.electronics,
+                stock_quantity=5
+            )
+        Product.objects.create(name='Dune', price=Decimal('12.00'), category=self.books, stock_quantity=5)
+        self.client.force_authenticate(user=self.admin)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson_with_filters(self):
+        """Test the export streams every matching product, honouring the list filters"""
+        with self.assertNumQueries(2): # category filter + products
+            response = self.client.get(f'/api/v1/catalog/products/export/?category={self.electronics.id}')
+            lines = self.read(response).splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        products = [json.loads(line) for line in lines]
+        self.assertEqual(len(products), 3)
+        self.assertTrue(all(product['category']['name'] == 'Electronics' for product in products))
+
+    def test_export_csv(self):
+        """Test the CSV export flattens nested categories into columns"""
+        response = self.client.get('/api/v1/catalog/products/export/?export_format=csv&ordering=name')
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['name'], 'Dune')
+        self.assertEqual(rows[0]['category.full_path'], 'Books')
+
+    def test_export_unknown_format(self):
+        """Test unsupported export formats are rejected"""
+        response = self.client.get('/api/v1/catalog/products/export/?export_format=xml')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_admin_only(self):
+        """Test anonymous users cannot export the catalog"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/api/v1/catalog/products/export/')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class ImportCatalogCommandTestCase(TestCase):
+    def setUp(self):
+        """Set up an existing category and product"""
+        self.electronics = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='iPhone 15',
+            price=Decimal('900.00'),
+            category=self.electronics,
+            stock_quantity=10
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_feed(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_import_csv(self):
+        """Test importing creates categories, creates products and updates matching ones"""
+        path = self.write_feed('feed.csv', (
+            'category,name,price,stock_quantity\n'
+            'Electronics > Phones > Android,,,\n'
+            'Electronics > Phones,Pixel 8,700.00,5\n'
+            'Electronics,iPhone 15,950.00,\n'
+            'Electronics,Broken,-1,3\n'
+        ))
+        stderr = StringIO()
+
+        call_command('import_catalog', path, '--batch-size', '2', stdout=StringIO(), stderr=stderr)
+
+        android = Category.objects.get(name='Android')
+        self.assertEqual(android.full_path, 'Electronics > Phones > Android')
+        self.assertTrue(Product.objects.filter(name='Pixel 8', category__name='Phones').exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('950.00'))
+        self.assertEqual(self.product.stock_quantity, 10)
+        self.assertFalse(Product.objects.filter(name='Broken').exists())
+        self.assertIn('Row 4', stderr.getvalue())
+        self.assertEqual(CategoryPriceRollup.objects.get(category=self.electronics).product_count, 2)
+
+    def test_import_jsonl_resumes_from_checkpoint(self):
+        """Test an import skips the rows recorded in its checkpoint and removes it when done"""
+        path = self.write_feed('feed.jsonl', '\n'.join([
+            '{"category": "Books", "name": "Skipped", "price": "10.00", "stock_quantity": 1}',
+            '{"category": "Books", "name": "Dune", "price": "12.00", "stock_quantity": 4}',
+        ]))
+        checkpoint = self.write_feed('feed.checkpoint', '1')
+        stdout = StringIO()
+
+        call_command('import_catalog', path, '--checkpoint', checkpoint, stdout=stdout)
+
+        self.assertTrue(Product.objects.filter(name='Dune').exists())
+        self.assertFalse(Product.objects.filter(name='Skipped').exists())
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertIn('rows/s', stdout.getvalue())
+
+class CatalogConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='iPhone 15',
+            price=Decimal('999.99'),
+            category=self.category,
+            stock_quantity=10
+        )
+        # Last-Modified is only sent once the second of the last change is over
+        CatalogVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def test_catalog_responses_carry_validators(self):
+        """Test catalog reads return ETag and Last-Modified headers"""
+        response = self.client.get('/api/v1/catalog/products/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a matching If-None-Match only reads the catalog version"""
+        etag = self.client.get('/api/v1/catalog/products/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/catalog/products/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_differs_per_resource(self):
+        """Test different URLs get different ETags"""
+        list_etag = self.client.get('/api/v1/catalog/products/')['ETag']
+        detail_etag = self.client.get(f'/api/v1/catalog/products/{self.product.id}/')['ETag']
+
+        self.assertNotEqual(list_etag, detail_etag)
+
+    def test_product_change_invalidates_etag(self):
+        """Test product writes bump the catalog version"""
+        etag = self.client.get('/api/v1/catalog/products/')['ETag']
+
+        self.product.stock_quantity = 5
+        self.product.save()
+
+        response = self.client.get('/api/v1/catalog/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_category_change_invalidates_etag(self):
+        """Test category writes bump the catalog version"""
+        etag = self.client.get('/api/v1/catalog/categories/')['ETag']
+
+        Category.objects.create(name='Books')
+
+        response = self.client.get('/api/v1/catalog/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since_returns_not_modified(self):
+        """Test an up to date If-Modified-Since returns 304"""
+        last_modified = self.client.get('/api/v1/catalog/categories/')['Last-Modified']
+
+        response = self.client.get('/api/v1/catalog/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_ignored_with_etag(self):
+        """Test If-Modified-Since is not honoured when a stale If-None-Match was sent"""
+        response = self.client.get('/api/v1/catalog/categories/')
+
+        response = self.client.get(
+            '/api/v1/catalog/categories/',
+            HTTP_IF_NONE_MATCH='"0-stale"', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_change_within_second_is_not_dated(self):
+        """Test a change in the current second sends no Last-Modified, so it can't answer a stale 304"""
+        last_modified = self.client.get('/api/v1/catalog/categories/')['Last-Modified']
+
+        Category.objects.create(name='Books')
+
+        response = self.client.get('/api/v1/catalog/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_version_sums_shards(self):
+        """Test bumps on any shard advance the catalog version"""
+        version = CatalogVersion.current().version
+
+        CatalogVersion.objects.filter(pk=CatalogVersion.SHARDS).update(version=F('version') + 5)
+
+        self.assertEqual(CatalogVersion.current().version, version + 5)
+
+class CatalogResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            user_type='admin',
+            is_staff=True
+        )
+
+        self.electronics = Category.objects.create(name='Electronics')
+        self.books = Category.objects.create(name='Books')
+        self.phone = Product.objects.create(
+            name='iPhone 15',
+            price=Decimal('999.99'),
+            category=self.electronics,
+            stock_quantity=10
+        )
+
+    def test_repeated_list_is_served_from_cache(self):
+        """Test a repeated request only reads the catalog version"""
+        first = self.client.get('/api/v1/catalog/products/?ordering=price')
+
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/v1/catalog/products/?ordering=price')
+
+        self.assertEqual(first.json(), second.json())
+
+    def test_query_parameters_are_part_of_the_key(self):
+        """Test different filters are cached separately"""
+        self.client.get(f'/api/v1/catalog/products/?category={self.electronics.id}')
+        response = self.client.get(f'/api/v1/catalog/products/?category={self.books.id}')
+
+        self.assertEqual(len(response.json()['data']['results']), 0)
+
+    def test_product_save_invalidates_list_and_detail(self):
+        """Test product writes invalidate the cached product responses"""
+        self.client.get('/api/v1/catalog/products/')
+        self.client.get(f'/api/v1/catalog/products/{self.phone.id}/')
+
+        self.phone.name = 'iPhone 15 Pro'
+        self.phone.save()
+
+        list_response = self.client.get('/api/v1/catalog/products/')
+        detail_response = self.client.get(f'/api/v1/catalog/products/{self.phone.id}/')
+
+        self.assertEqual(list_response.json()['data']['results'][0]['name'], 'iPhone 15 Pro')
+        self.assertEqual(detail_response.json()['data']['name'], 'iPhone 15 Pro')
+
+    def test_product_save_only_invalidates_its_subtree_aggregates(self):
+        """Test average prices of unrelated categories stay cached"""
+        self.client.get(f'/api/v1/catalog/categories/{self.electronics.id}/average-price/')
+        self.client.get(f'/api/v1/catalog/categories/{self.books.id}/average-price/')
+
+        Product.objects.create(
+            name='Galaxy S25',
+            price=Decimal('799.99'),
+            category=self.electronics,
+            stock_quantity=5
+        )
+
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/v1/catalog/categories/{self.books.id}/average-price/')
+
+        response = self.client.get(f'/api/v1/catalog/categories/{self.electronics.id}/average-price/')
+        self.assertEqual(response.json()['data']['total_products'], 2)
+
+    def test_category_rename_invalidates_product_responses(self):
+        """Test category writes invalidate embedded category data"""
+        self.client.get(f'/api/v1/catalog/products/{self.phone.id}/')
+
+        self.electronics.name = 'Gadgets'
+        self.electronics.save()
+
+        response = self.client.get(f'/api/v1/catalog/products/{self.phone.id}/')
+        self.assertEqual(response.json()['data']['category']['full_path'], 'Gadgets')
@@ -5,8 +5,12 @@ app_name = 'catalog'
 
 urlpatterns = [
     path('categories/', view=views.CategoryListCreateAPIView.as_view(), name='category-list'),
+    path('categories/tree/', view=views.CategoryTreeAPIView.as_view(), name='category-tree'),
     path('categories/<int:pk>/', view=views.CategoryDetailAPIView.as_view(), name='category-detail'),
     path('categories/<int:pk>/average-price/', view=views.CategoryAveragePriceAPIView.as_view(), name='category-avg-price'),
     path('products/', view=views.ProductListCreateAPIView.as_view(), name='product-list'),
+    path('products/suggest/', view=views.ProductSuggestAPIView.as_view(), name='product-suggest'),
+    path('products/export/', view=views.ProductExportAPIView.as_view(), name='product-export'),
+    path('products/bulk/', view=views.ProductBulkAPIView.as_view(), name='product-bulk'),
     path('products/<int:pk>/', view=views.ProductDetailAPIView.as_view(), name='product-detail')
 ]
\ No newline at end of file
@@ -1,27 +1,44 @@
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
 
-from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
+from core.exports import StreamingExportMixin
+from core.fieldsets import SparseFieldsetQuerysetMixin
+from core.pagination import PageNumberOrCursorPagination
+from core.permissions import IsAdmin
+
+from . import cache as catalog_cache
+from .filters import ProductFilter, ProductOrderingFilter, ProductSearchFilter
+from .mixins import CachedResponseMixin, CatalogConditionalGetMixin
+from .models import Category, CategoryPriceRollup, Product
+from .serializers import CategorySerializer, ProductBulkSerializer, ProductSerializer, ProductSuggestionSerializer
 from .permissions import IsAdminOrReadOnly
+from .services.product_bulk_service import product_bulk_service
+from .services.product_facet_service import product_facet_service
 
-class CategoryListCreateAPIView(generics.ListCreateAPIView):
+class CategoryListCreateAPIView(CatalogConditionalGetMixin, CachedResponseMixin, SparseFieldsetQuerysetMixin, generics.ListCreateAPIView):
     """
     List or create a new category
     """
-    queryset = Category.objects.all()
+    # Counters change with products too
+    cache_scopes = ['categories', 'products']
+    sparse_field_columns = {'children': [], 'subtree_product_count': ['price_rollup__product_count']}
+    queryset = Category.objects.select_related('price_rollup').prefetch_related('children')
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
 
-class CategoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailAPIView(CatalogConditionalGetMixin, CachedResponseMixin, SparseFieldsetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a category
     """
-    queryset = Category.objects.all()
+    cache_scopes = ['categories', 'subtree:{pk}']
+    sparse_field_columns = {'children': [], 'subtree_product_count': ['price_rollup__product_count']}
+    queryset = Category.objects.select_related('price_rollup').prefetch_related('children')
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
 
@@ -30,14 +47,14 @@ class CategoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         category = self.get_object()
 
         # Check if category has children
-        if category.children.exists():
+        if category.child_count:
             return Response(
                 data='Cannot delete a category with subcategories. Delete subcategories first.',
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # Check if category has products
-        if category.products.exists():
+        if category.product_count:
             return Response(
                 data='Cannot delete a category with products. Move or delete products first.',
                 status=status.HTTP_400_BAD_REQUEST
@@ -45,66 +62,252 @@ class CategoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
         return super().destroy(request, *args, **kwargs)
     
-class CategoryAveragePriceAPIView(APIView):
+class CategoryTreeAPIView(CatalogConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    """
+    Return the whole category hierarchy as nested nodes,
+    loaded in one query and assembled in memory
+    """
+    pagination_class = None
+
+    def include_counts(self):
+        return self.request.query_params.get('include_counts') in ('true', '1')
+
+    def get_cache_scopes(self):
+        return ['categories', 'products'] if self.include_counts() else ['categories']
+
+    def get_queryset(self):
+        fields = ['id', 'name', 'parent_id', 'full_path']
+        if self.include_counts():
+            # Subtree counts come from the maintained price rollups
+            fields.append('price_rollup__product_count')
+        return Category.objects.values(*fields)
+
+    def list(self, request, *args, **kwargs):
+        nodes = {}
+        roots = []
+
+        # Categories are ordered by name, so siblings stay ordered too
+        rows = list(self.get_queryset())
+        for row in rows:
+            node = {
+                'id': row['id'],
+                'name': row['name'],
+                'full_path': row['full_path'],
+                'children': [],
+            }
+            if 'price_rollup__product_count' in row:
+                node['product_count'] = row['price_rollup__product_count'] or 0
+            nodes[row['id']] = node
+
+        for row in rows:
+            parent = nodes.get(row['parent_id'])
+            if parent:
+                parent['children'].append(nodes[row['id']])
+            else:
+                roots.append(nodes[row['id']])
+
+        return Response(data=roots, status=status.HTTP_200_OK)
+
+class CategoryAveragePriceAPIView(CatalogConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
     """
     Return average product price for a given category
     """
-    def get(self, request, pk):
+    # Subtree totals are maintained incrementally, so this is a single lookup
+    queryset = Category.objects.select_related('price_rollup')
+    cache_scopes = ['subtree:{pk}', 'categories']
+
+    def retrieve(self, request, *args, **kwargs):
         try:
-            category = Category.objects.get(pk=pk)
-        except Category.DoesNotExist:
+            category = self.get_object()
+        except Http404:
             return Response(
                 data='Category with the given ID does not exist',
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get all products in this category and subcategories
-        all_categories = [category] + category.get_all_children()
-        
-        avg_price = Product.objects.filter(
-            category__in=all_categories,
-            is_active = True
-        ).aggregate( # perform db-level calculation
-            avg_price=Avg('price') # get average of the proce field
-        )['avg_price'] # extract the value from returned dict
-
-        total_products = Product.objects.filter(
-            category__in=all_categories,
-            is_active = True
-        ).count()
+        rollup = getattr(category, 'price_rollup', None) or CategoryPriceRollup(category=category)
 
         return Response(
             data={
                 'category_id': category.id,
                 'category_name': category.name,
-                'average_price': round(avg_price, 2) if avg_price else 0,
-                'total_products': total_products
+                'average_price': rollup.average_price,
+                'min_price': rollup.min_price,
+                'max_price': rollup.max_price,
+                'total_products': rollup.product_count
             },
             status=status.HTTP_200_OK
         )
     
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class ProductFieldsetMixin(SparseFieldsetQuerysetMixin):
+    sparse_field_columns = {
+        'category': ['category', 'category__id', 'category__name', 'category__full_path'],
+    }
+
+class ProductFilteringMixin(ProductFieldsetMixin):
     """
-    List all products or create a new product
+    Queryset and filters shared by the product list and its export
     """
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('category').defer('search_vector')
     serializer_class = ProductSerializer
-    permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'category__parent']
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
+    filterset_class = ProductFilter
     search_fields = ['name', 'description']
-    ordering_fields = ['price', 'created_at', 'name']
+    ordering_fields = ['price', 'created_at', 'name', 'popularity']
     ordering = ['-created_at']
 
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductListCreateAPIView(CatalogConditionalGetMixin, CachedResponseMixin, ProductFilteringMixin, generics.ListCreateAPIView):
+    """
+    List all products or create a new product
+    """
+    cache_scopes = ['products', 'categories']
+    permission_classes = [IsAdminOrReadOnly]
+    pagination_class = PageNumberOrCursorPagination
+    # search_rank is the default ordering of search results
+    cursor_ordering_fields = ['price', 'created_at', 'name', 'popularity', 'search_rank']
+
+    def include_facets(self):
+        return self.request.query_params.get('facets') in ('true', '1')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        if self.include_facets():
+            response.data['facets'] = self.get_facets(queryset)
+        return response
+
+    def get_facets(self, queryset):
+        """
+        Facet counts of the filtered products, shared by every page and ordering
+        """
+        paginator = self.paginator
+        ignored = [
+            paginator.page_query_param, paginator.mode_query_param,
+            paginator.cursor_query_param, ProductOrderingFilter.ordering_param,
+        ]
+        key = catalog_cache.get_response_key(
+            self.request, self.get_cache_scopes(), ignored_params=ignored, key=catalog_cache.FACETS_KEY
+        )
+
+        facets = cache.get(key)
+        if facets is None:
+            facets = product_facet_service.get_facets(queryset)
+            cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+        return facets
+
+class ProductSuggestAPIView(CatalogConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    """
+    Suggest active products whose name starts with ?q=,
+    most popular first, for typeahead search boxes
+    """
+    cache_scopes = ['products']
+    serializer_class = ProductSuggestionSerializer
+    pagination_class = None
+    default_limit = 10
+    max_limit = 20
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        return min(max(limit, 1), self.max_limit)
+
+    def get_queryset(self):
+        prefix = self.request.query_params.get('q', '').strip()
+        if not prefix:
+            return Product.objects.none()
+
+        # Selective prefixes are served by a partial prefix index on UPPER(name) of active
+        # products on PostgreSQL, broad ones by walking product_popularity_idx up to the limit
+        return Product.objects.filter(is_active=True, name__istartswith=prefix).only(
+            'id', 'name', 'price'
+        ).order_by('-popularity', '-id')[:self.get_limit()]
+
+class ProductExportAPIView(StreamingExportMixin, ProductFilteringMixin, generics.GenericAPIView):
+    """
+    Stream every product matching the list filters as NDJSON or CSV
+    """
+    permission_classes = [IsAdmin]
+    export_filename = 'products'
+
+class ProductDetailAPIView(CatalogConditionalGetMixin, CachedResponseMixin, ProductFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a product
     """
-    queryset = Product.objects.all()
+    cache_scopes = ['product:{pk}', 'categories']
+    queryset = Product.objects.select_related('category').defer('search_vector')
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
 
     def perform_destroy(self, instance):
         """Soft delete - mark as inactive instead of deleting"""
         instance.is_active = False
-        instance.save()
\ No newline at end of file
+        instance.save()
+
+class ProductBulkAPIView(generics.GenericAPIView):
+    """
+    Create, update or deactivate a batch of products in one transaction.
+    Either every row is applied or none is, with errors reported per row
+    """
+    serializer_class = ProductBulkSerializer
+    permission_classes = [IsAdminOrReadOnly]
+
+    def get_ids(self, values):
+        ids = set()
+        for value in values:
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    def preload(self, data):
+        """
+        Load every referenced product and category up front,
+        so rows are validated without a query each
+        """
+        data = data if isinstance(data, dict) else {}
+        rows = data.get('upserts')
+        rows = [row for row in rows if isinstance(row, dict)] if isinstance(rows, list) else []
+        deactivate = data.get('deactivate')
+        deactivate = deactivate if isinstance(deactivate, list) else []
+
+        product_ids = self.get_ids([row.get('id') for row in rows] + deactivate)
+        # Lock in primary key order so concurrent batches cannot deadlock
+        products = Product.objects.select_for_update(of=('self',)).select_related('category').filter(
+            pk__in=product_ids
+        ).order_by('pk')
+        category_ids = self.get_ids(row.get('category') for row in rows)
+
+        return {
+            'products': {product.pk: product for product in products},
+            'categories': Category.objects.in_bulk(category_ids),
+        }
+
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        context = {**self.get_serializer_context(), **self.preload(request.data)}
+        serializer = self.get_serializer_class()(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+
+        created, updated = product_bulk_service.apply(
+            serializer.validated_data.get('upserts', []),
+            serializer.context['products'],
+            serializer.validated_data.get('deactivate', []),
+        )
+        deactivated = set(serializer.validated_data.get('deactivate', []))
+
+        return Response(
+            data={
+                'created': [product.id for product in created],
+                'updated': [product.id for product in updated if product.id not in deactivated],
+                'deactivated': sorted(deactivated),
+            },
+            status=status.HTTP_200_OK
+        )
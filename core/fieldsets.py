@@ -0,0 +1,87 @@
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_names(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def get_sparse_fields(request, available):
+    """
+    Names of the fields kept by ?fields= and ?omit=, in their declared order,
+    or None when the request does not narrow them
+    """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+
+    requested = parse_field_names(request.query_params.get(FIELDS_PARAM))
+    omitted = parse_field_names(request.query_params.get(OMIT_PARAM))
+    if not requested and not omitted:
+        return None
+
+    unknown = [name for name in requested + omitted if name not in available]
+    if unknown:
+        raise ValidationError({
+            FIELDS_PARAM: [f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(available)}."]
+        })
+
+    kept = requested or available
+    return [name for name in available if name in kept and name not in omitted]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Drop the fields a client did not ask for with ?fields=a,b or ?omit=c.
+    Only applies to the top level serializer of safe requests
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        kept = get_sparse_fields(self.context.get('request'), list(self.fields))
+        if kept is not None:
+            for name in set(self.fields) - set(kept):
+                self.fields.pop(name)
+
+
+class SparseFieldsetQuerysetMixin:
+    """
+    Load only the columns behind the fields kept by ?fields= and ?omit=.
+
+    `sparse_field_columns` maps serializer fields to the columns they read,
+    other fields read the column of the same name. Relations are only joined
+    when one of their columns is needed. The primary key and the cursor
+    ordering fields are always loaded, and prefetches are dropped with their field
+    """
+    sparse_field_columns = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        available = list(self.get_serializer_class()().fields)
+        kept = get_sparse_fields(self.request, available)
+        if kept is None:
+            return queryset
+
+        # Cursor orderings on annotations, like search_rank, need no column
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = {'pk', *(name for name in getattr(self, 'cursor_ordering_fields', []) if name in concrete)}
+        for name in kept:
+            columns.update(self.sparse_field_columns.get(name, [name]))
+
+        if queryset.query.select_related:
+            relations = {column.split('__')[0] for column in columns if '__' in column}
+            queryset = queryset.select_related(None)
+            if relations:
+                queryset = queryset.select_related(*relations)
+
+        lookups = queryset._prefetch_related_lookups
+        if lookups:
+            queryset = queryset.prefetch_related(None).prefetch_related(*[
+                lookup for lookup in lookups
+                if not isinstance(lookup, str) or lookup.split('__')[0] in kept
+            ])
+
+        return queryset.only(*columns)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+LOCK_KEY = 'idempotency:lock:{scope}'
+RESPONSE_KEY = 'idempotency:response:{scope}'
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed, retry later.'
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class IdempotentCreateMixin:
+    """
+    Honour an Idempotency-Key header on create.
+
+    The first successful response is stored in the cache for each user and key,
+    and retries with the same key get it back without running the create again.
+    Concurrent retries wait for the first one to finish, and a key sent
+    with a different payload is rejected.
+    """
+    idempotency_header = 'Idempotency-Key'
+    idempotency_key_max_length = 255
+    # How long a request may hold a key, and how long duplicates wait for it
+    idempotency_lock_timeout = 30
+    idempotency_wait_timeout = 10
+    idempotency_poll_interval = 0.1
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+
+        if not key or len(key) > self.idempotency_key_max_length:
+            raise ValidationError({
+                self.idempotency_header: [f'Must be 1 to {self.idempotency_key_max_length} characters long.']
+            })
+
+        scope = self.get_idempotency_scope(request, key)
+        fingerprint = self.get_idempotency_fingerprint(request)
+        token = uuid.uuid4().hex
+
+        deadline = time.monotonic() + self.idempotency_wait_timeout
+        while not cache.add(LOCK_KEY.format(scope=scope), token, timeout=self.idempotency_lock_timeout):
+            stored = cache.get(RESPONSE_KEY.format(scope=scope))
+            if stored is not None:
+                return self.replay_idempotent_response(stored, fingerprint)
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInUse()
+            time.sleep(self.idempotency_poll_interval)
+
+        try:
+            # The lock may have been taken after a previous holder stored its response
+            stored = cache.get(RESPONSE_KEY.format(scope=scope))
+            if stored is not None:
+                return self.replay_idempotent_response(stored, fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+            # Failed requests changed nothing and may be retried with the same key
+            if status.is_success(response.status_code):
+                cache.set(
+                    RESPONSE_KEY.format(scope=scope),
+                    {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data},
+                    timeout=settings.IDEMPOTENCY_KEY_TIMEOUT,
+                )
+            return response
+        finally:
+            if cache.get(LOCK_KEY.format(scope=scope)) == token:
+                cache.delete(LOCK_KEY.format(scope=scope))
+
+    def get_idempotency_scope(self, request, key):
+        """
+        Keys are only unique per user and endpoint
+        """
+        user = request.user.pk if request.user.is_authenticated else 'anonymous'
+        raw = f'{request.path}|{user}|{key}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get_idempotency_fingerprint(self, request):
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def replay_idempotent_response(self, stored, fingerprint):
+        if stored['fingerprint'] != fingerprint:
+            raise IdempotencyKeyReused()
+        return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
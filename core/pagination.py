@@ -0,0 +1,149 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PageNumberOrCursorPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Clients opt in with ?pagination=cursor and then follow the next/previous
+    links. Pages are fetched with a WHERE clause on (ordering field, id)
+    instead of OFFSET, and no total count is computed.
+    Views list the fields they allow with `cursor_ordering_fields`,
+    which may include annotations of the filtered queryset.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = request.query_params.get(self.mode_query_param) == 'cursor'
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.ordering = self.get_cursor_ordering(queryset, view)
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+
+        position = self.decode_cursor(request)
+        reverse = bool(position and position['reverse'])
+
+        # Walking backwards reads the preceding rows in the opposite direction
+        forwards = descending != reverse
+        queryset = queryset.order_by(*([f'-{field}', '-pk'] if forwards else [field, 'pk']))
+        if position:
+            queryset = queryset.filter(self.get_keyset_filter(field, forwards, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_row = rows[-1] if has_next and rows else None
+        self.previous_row = rows[0] if has_previous and rows else None
+        return rows
+
+    def get_cursor_ordering(self, queryset, view):
+        """
+        Get the ordering applied by the filter backends, falling back to the model default
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        primary = ordering[0] if ordering else 'pk'
+
+        allowed = getattr(view, 'cursor_ordering_fields', [])
+        if not isinstance(primary, str) or primary.lstrip('-') not in allowed:
+            raise ValidationError({
+                'ordering': [f"Cursor pagination supports ordering by {', '.join(allowed)} only."]
+            })
+        return primary
+
+    def get_keyset_filter(self, field, descending, position):
+        value = position['value']
+        pk = position['pk']
+        # The redundant range on the field lets the database seek its index
+        if descending:
+            return Q(**{f'{field}__lte': value}) & (Q(**{f'{field}__lt': value}) | Q(pk__lt=pk))
+        return Q(**{f'{field}__gte': value}) & (Q(**{f'{field}__gt': value}) | Q(pk__gt=pk))
+
+    def encode_cursor(self, row, reverse):
+        field = self.ordering.lstrip('-')
+        value = getattr(row, field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+
+        payload = {'o': self.ordering, 'v': value, 'pk': row.pk, 'r': int(reverse)}
+        token = urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()).decode())
+            if payload['o'] != self.ordering:
+                raise ValueError('Cursor was issued for a different ordering')
+
+            field = self.ordering.lstrip('-')
+            # Orderings may also be on annotations, such as search relevance
+            if field in self.annotations:
+                model_field = self.annotations[field].output_field
+            else:
+                model_field = self.model._meta.get_field(field)
+            return {
+                'value': model_field.to_python(payload['v']),
+                'pk': int(payload['pk']),
+                'reverse': bool(payload['r']),
+            }
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_row is None:
+            return None
+        return self.encode_cursor(self.next_row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if self.previous_row is None:
+            return None
+        return self.encode_cursor(self.previous_row, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
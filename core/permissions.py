@@ -0,0 +1,6 @@
+from rest_framework import permissions
+
+class IsAdmin(permissions.BasePermission):
+    """Only admins can access the view"""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin_user
@@ -211,6 +211,35 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Periodic tasks, run by `celery -A ecommerce_api beat`
+CELERY_BEAT_SCHEDULE = {
+    'refresh-popularity': {
+        'task': 'catalog.tasks.refresh_popularity',
+        'schedule': 60 * 15,
+    },
+    'release-expired-reservations': {
+        'task': 'orders.tasks.release_expired_reservations',
+        'schedule': 60,
+    },
+}
+
+# How long a reservation holds stock for a pending checkout, in seconds
+RESERVATION_TTL = 60 * 10
+
+# Cache (shares the Redis instance with Celery, on a separate database)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://localhost:{REDIS_PORT}/1',
+    }
+}
+
+# How long catalog responses stay cached, invalidation normally happens sooner
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
+# How long responses are kept for retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+
 # Email configuration (for development only)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@ecommerce.com'
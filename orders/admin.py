@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, Reservation, ReservationItem
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -22,4 +22,24 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'price', 'subtotal']
     list_filter = ['order__status']
-    search_fields = ['product__name', 'order__customer__email']
\ No newline at end of file
+    search_fields = ['product__name', 'order__customer__email']
+
+class ReservationItemInline(admin.TabularInline):
+    # Held quantities are counted on the products, they only change through ReservationService
+    model = ReservationItem
+    extra = 0
+    readonly_fields = ['product', 'quantity']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'customer', 'created_at', 'expires_at']
+    search_fields = ['customer__email']
+    readonly_fields = ['customer', 'created_at']
+    inlines = [ReservationItemInline]
+
+    def has_add_permission(self, request):
+        return False
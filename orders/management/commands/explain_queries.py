@@ -0,0 +1,83 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from catalog.models import Category, Product
+from orders.models import Order
+
+# Sequential scans as reported by PostgreSQL and SQLite plans
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)'),
+}
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the queries behind the catalog and order endpoints and flag sequential scans on large tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Only flag sequential scans on tables with at least this many rows'
+        )
+
+    def get_queries(self):
+        """
+        Representative queries of each endpoint, using existing rows as sample values
+        """
+        category_id = Category.objects.values_list('id', flat=True).first() or 0
+        customer_id = Order.objects.values_list('customer_id', flat=True).first() or 0
+        products = Product.objects.select_related('category')
+
+        return {
+            'product list': products.order_by('-created_at', '-id')[:10],
+            'product list by category': products.filter(category_id=category_id).order_by('-created_at')[:10],
+            'product list by price': products.order_by('price', 'id')[:10],
+            'product list by name': products.order_by('name', 'id')[:10],
+            'product list by popularity': products.order_by('-popularity', '-id')[:10],
+            'product suggestions': Product.objects.filter(is_active=True, name__istartswith='a').order_by('-popularity', '-id')[:10],
+            'category subtree': Category.objects.filter(path__startswith=f'{category_id}/'),
+            'category active price range': Product.objects.filter(category_id=category_id, is_active=True).order_by('price')[:1],
+            'customer orders': Order.objects.filter(customer_id=customer_id).order_by('-created_at')[:10],
+            'orders by status': Order.objects.filter(status='pending').order_by('-created_at')[:10],
+            'admin order list': Order.objects.order_by('-created_at', '-id')[:10],
+        }
+
+    def get_row_counts(self, tables):
+        if connection.vendor == 'postgresql':
+            # Planner estimates, counting huge tables would take longer than the plans
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)', [list(tables)])
+                return {name: int(rows) for name, rows in cursor.fetchall()}
+
+        counts = {}
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                counts[table] = cursor.fetchone()[0]
+        return counts
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        tables = {model._meta.db_table for model in [Category, Product, Order]}
+        row_counts = self.get_row_counts(tables)
+        flagged = 0
+
+        for name, queryset in self.get_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+
+            if not pattern:
+                continue
+            for table in sorted(set(pattern.findall(plan))):
+                if row_counts.get(table, 0) >= options['min_rows']:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"Sequential scan on {table} ({row_counts[table]} rows)"
+                    ))
+
+        if flagged:
+            self.stdout.write(self.style.ERROR(f"Found {flagged} sequential scans on large tables."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans on large tables."))
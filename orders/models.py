@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from catalog.models import Product
 
 User = get_user_model()
@@ -27,12 +28,21 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Customer order history and the admin listing, newest first
+            models.Index(fields=['customer', '-created_at'], name='order_customer_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.pk} - {self.customer.email} - ${self.total_amount}"
     
     @property
     def total_items(self):
+        # Listings annotate the sum in the database
+        if hasattr(self, 'items_quantity'):
+            return self.items_quantity or 0
         return sum(item.quantity for item in self.items.all())
     
 class OrderItem(models.Model):
@@ -51,4 +61,34 @@ class OrderItem(models.Model):
     def subtotal(self):
         if self.quantity is None or self.price is None:
             return 0
-        return self.quantity * self.price
\ No newline at end of file
+        return self.quantity * self.price
+
+class Reservation(models.Model):
+    """
+    Stock held for a customer's pending checkout until it expires
+    """
+    customer = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='reservations')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['expires_at']
+
+    def __str__(self):
+        return f"Reservation #{self.pk} - {self.customer.email} - expires {self.expires_at}"
+
+    @property
+    def is_live(self):
+        return self.expires_at > timezone.now()
+
+
+class ReservationItem(models.Model):
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservation_items')
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['reservation', 'product']
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product.name}"
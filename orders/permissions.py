@@ -22,10 +22,17 @@ class IsCustomerOrAdminReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Customers can only access their own orders
         if request.user.is_customer:
-            return obj.customer == request.user
+            return obj.customer_id == request.user.pk
         
         # Admins can access any order
         if request.user.is_admin_user:
             return True
             
-        return False
\ No newline at end of file
+        return False
+
+class IsCustomer(permissions.BasePermission):
+    """
+    Only customers can hold stock for their checkout
+    """
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_customer
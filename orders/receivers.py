@@ -0,0 +1,11 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Reservation
+from .services.reservation_service import reservation_service
+
+
+@receiver(pre_delete, sender=Reservation)
+def release_reservation(sender, instance, **kwargs):
+    """Held stock goes back on every delete, including admin and cascading deletes"""
+    reservation_service.return_held(instance)
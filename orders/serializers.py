@@ -1,7 +1,14 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
-from .models import Order, OrderItem
+from catalog.models import Product
+from catalog.services.product_bulk_service import product_bulk_service
+from core.fieldsets import SparseFieldsetSerializerMixin
+
+from .models import Order, OrderItem, Reservation, ReservationItem
+from .services.reservation_service import reservation_service
 
 class OrderItemSerializer(serializers.ModelSerializer):
     subtotal = serializers.ReadOnlyField()
@@ -18,8 +25,57 @@ class OrderItemSerializer(serializers.ModelSerializer):
             )
         return value
 
-class OrderCreateSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+class OrderItemCreateSerializer(OrderItemSerializer):
+    """
+    Line of a new order, its product is resolved with the rest of the cart by OrderCreateSerializer
+    """
+    product = serializers.IntegerField(source='product_id')
+
+class CartItemsSerializerMixin:
+    """
+    Validate a cart of product and quantity items against the available stock,
+    resolving every product in one query
+    """
+    empty_cart_message = 'Order must have at least one item'
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError(self.empty_cart_message)
+
+        # Resolve the whole cart in one query, and report every invalid line at once
+        products = Product.objects.in_bulk({item['product_id'] for item in value})
+
+        errors = []
+        seen = set()
+        for item in value:
+            pk, quantity = item['product_id'], item['quantity']
+            product = products.get(pk)
+            error = {}
+
+            if product is None:
+                error['product'] = [f'Invalid pk "{pk}" - object does not exist.']
+            elif not product.is_active:
+                error['product'] = [f'{product.name} is no longer available.']
+            elif pk in seen:
+                error['product'] = [f'{product.name} is listed more than once, combine its quantities in one item.']
+            elif product.available_quantity < quantity:
+                error['quantity'] = [
+                    f"Insufficient stock for {product.name}. Available: {product.available_quantity}, Requested: {quantity}"
+                ]
+
+            seen.add(pk)
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return [{'product': products[item['product_id']], 'quantity': item['quantity']} for item in value]
+
+class OrderCreateSerializer(CartItemsSerializerMixin, serializers.ModelSerializer):
+    items = OrderItemCreateSerializer(many=True, required=False)
+    reservation = serializers.PrimaryKeyRelatedField(
+        queryset=Reservation.objects.all(), required=False, write_only=True
+    )
     total_amount = serializers.ReadOnlyField()
 
     save_as_default = serializers.BooleanField(required=False, default=False)
@@ -28,23 +84,14 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             'customer_email', 'customer_phone', 'delivery_address',
-            'items', 'total_amount', 'save_as_default'
+            'items', 'reservation', 'total_amount', 'save_as_default'
         ]
 
     def validate(self, data):
-        # Extract items from the data
-        items_data = data.get('items', [])
-
-        # Check stock for all items
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
+        # An order is placed from its items or from the reservation holding them
+        if ('items' in data) == ('reservation' in data):
+            raise serializers.ValidationError({'items': ['Provide either items or a reservation.']})
 
-            if product.stock_quantity < quantity:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for {product.name}. Available: {product.stock_quantity}, Requested: {quantity}"
-                )
-            
         # Validate required fields for order completion
         user = self.context['request'].user
 
@@ -69,45 +116,91 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             
         return data
 
-    def validate_items(self, value):
-        if not value:
-            raise serializers.ValidationError(
-                'Order must have at least one item'
-            )
+    def validate_reservation(self, value):
+        if value.customer_id != self.context['request'].user.pk:
+            raise serializers.ValidationError(f'Invalid pk "{value.pk}" - object does not exist.')
+        if not value.is_live:
+            raise serializers.ValidationError('This reservation has expired.')
         return value
+
+    def lock_products(self, items_data):
+        """
+        Lock the ordered products in primary key order so concurrent checkouts cannot deadlock,
+        then check the stock again since it may have changed since validation
+        """
+        quantities = {item_data['product'].pk: item_data['quantity'] for item_data in items_data}
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update(of=('self',)).select_related('category').filter(
+                pk__in=quantities.keys()
+            ).order_by('pk')
+        }
+        for pk, quantity in quantities.items():
+            product = products[pk]
+            if product.available_quantity < quantity:
+                raise serializers.ValidationError(
+                    f"Insufficient stock for {product.name}. Available: {product.available_quantity}, Requested: {quantity}"
+                )
+        return products, quantities
+
+    def claim_reservation(self, reservation):
+        """
+        Lock the reservation, which keeps the expiry sweeper from releasing it meanwhile,
+        then its products in primary key order like lock_products, since the sale writes them.
+        The held units are bought at the current price, and products deactivated since
+        the reservation was made fail the order
+        """
+        reservation = Reservation.objects.select_for_update().filter(
+            pk=reservation.pk, expires_at__gt=timezone.now()
+        ).first()
+        if reservation is None:
+            raise serializers.ValidationError({'reservation': ['This reservation has expired.']})
+
+        products = {}
+        quantities = {}
+        for product in Product.objects.select_for_update(of=('self',)).select_related('category').filter(
+            reservation_items__reservation=reservation
+        ).annotate(reserved=F('reservation_items__quantity')).order_by('pk'):
+            if not product.is_active:
+                raise serializers.ValidationError({'reservation': [f'{product.name} is no longer available.']})
+            products[product.pk] = product
+            quantities[product.pk] = product.reserved
+        return reservation, products, quantities
     
     def create(self, validated_data):
-        items_data = validated_data.pop('items')
+        items_data = validated_data.pop('items', None)
+        reservation = validated_data.pop('reservation', None)
         
         save_as_default = validated_data.pop('_save_as_default', False)
         final_phone = validated_data.pop('_final_phone')
         final_address = validated_data.pop('_final_address')
 
         user = self.context['request'].user
-        
-        with transaction.atomic(): # Ensure all-or-nothing
-            # Create order
-            order = Order.objects.create(total_amount=0, **validated_data)
-            total = 0
-
-            # Create order items
-            for item_data in items_data:
-                product = item_data['product']
-                quantity = item_data['quantity']
-                
-                # Create order item
-                order_item = OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=product.price # current product price
-                )
-
-                # Update stock
-                product.stock_quantity -= quantity
-                product.save()
 
-                total += order_item.subtotal
+        with transaction.atomic(): # Ensure all-or-nothing
+            if reservation:
+                reservation, products, quantities = self.claim_reservation(reservation)
+            else:
+                products, quantities = self.lock_products(items_data)
+
+            items = [
+                OrderItem(product=products[pk], quantity=quantity, price=products[pk].price) # current product price
+                for pk, quantity in quantities.items()
+            ]
+            order = Order.objects.create(total_amount=sum(item.subtotal for item in items), **validated_data)
+
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+
+            # Update stock and popularity
+            if not product_bulk_service.record_sales(products, quantities, reserved=reservation is not None):
+                raise serializers.ValidationError('Insufficient stock or inactive product, the products were updated meanwhile.')
+            if reservation:
+                # The sale already released the held units, drop the items first so deleting
+                # the reservation has nothing left to give back
+                reservation.items.all().delete()
+                reservation.delete()
 
             # Update user delivery_address/phone_number is requested
             profile_updated = False
@@ -124,13 +217,9 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 if profile_updated:
                     user.save()
 
-            # update order total
-            order.total_amount = total
-            order.save()
-
             return order
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total_items = serializers.ReadOnlyField()
 
@@ -140,4 +229,24 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'status', 'total_amount', 'total_items',
             'customer_email', 'customer_phone', 'delivery_address',
             'created_at', 'updated_at', 'items'
-        ]
\ No newline at end of file
+        ]
+class ReservationItemSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='product_id')
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = ReservationItem
+        fields = ['product', 'quantity']
+
+class ReservationSerializer(CartItemsSerializerMixin, serializers.ModelSerializer):
+    items = ReservationItemSerializer(many=True)
+    empty_cart_message = 'Reservation must have at least one item'
+
+    class Meta:
+        model = Reservation
+        fields = ['id', 'items', 'created_at', 'expires_at']
+        read_only_fields = ['created_at', 'expires_at']
+
+    def create(self, validated_data):
+        quantities = {item['product'].pk: item['quantity'] for item in validated_data['items']}
+        return reservation_service.reserve(self.context['request'].user, quantities)
@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from catalog.models import Product
+from orders.models import Reservation, ReservationItem
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService:
+    """
+    Service class for holding stock for pending checkouts.
+    Held units are counted on Product.reserved_quantity, so availability is read
+    from the product row alone and every hold or release is a single UPDATE.
+    Deleting a reservation in any way releases it
+    """
+    batch_size = 500
+
+    def held(self, quantities):
+        """
+        Per product quantities as one CASE expression
+        """
+        return Case(
+            *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+            default=Value(0), output_field=models.IntegerField()
+        )
+
+    def get_available(self, product_ids):
+        """
+        Units of each product that can still be ordered or reserved, in one query
+        """
+        return {
+            pk: max(stock - reserved, 0)
+            for pk, stock, reserved in Product.objects.filter(
+                pk__in=product_ids, is_active=True
+            ).values_list('pk', 'stock_quantity', 'reserved_quantity')
+        }
+
+    def reserve(self, customer, quantities):
+        """
+        Hold the given units of each product for the customer, all or nothing.
+        Raises a ValidationError listing the products without enough available stock
+        """
+        held = self.held(quantities)
+        with transaction.atomic():
+            # Checked and held in the same statement, so concurrent checkouts cannot oversell
+            updated = Product.objects.filter(
+                pk__in=quantities.keys(), is_active=True,
+                stock_quantity__gte=F('reserved_quantity') + held,
+            ).update(reserved_quantity=F('reserved_quantity') + held)
+
+            if updated != len(quantities):
+                available = self.get_available(quantities.keys())
+                raise serializers.ValidationError({
+                    'items': [
+                        f"Insufficient stock for product {pk}. Available: {available.get(pk, 0)}, Requested: {quantity}"
+                        for pk, quantity in quantities.items() if available.get(pk, 0) < quantity
+                    ] or ['Stock changed, please try again.']
+                })
+
+            reservation = Reservation.objects.create(
+                customer=customer, expires_at=timezone.now() + timedelta(seconds=settings.RESERVATION_TTL)
+            )
+            ReservationItem.objects.bulk_create([
+                ReservationItem(reservation=reservation, product_id=pk, quantity=quantity)
+                for pk, quantity in quantities.items()
+            ])
+
+        return reservation
+
+    def release(self, reservation_ids):
+        """
+        Delete the (locked) reservations, which gives their held stock back
+        """
+        Reservation.objects.filter(pk__in=reservation_ids).delete()
+
+    def return_held(self, reservation):
+        """
+        Give the units held by a reservation back to its products, in one UPDATE.
+        Runs whenever a reservation is deleted, whatever deletes it
+        """
+        held = ReservationItem.objects.filter(reservation=reservation, product=OuterRef('pk')).values('quantity')
+        Product.objects.filter(reservation_items__reservation=reservation).update(
+            reserved_quantity=F('reserved_quantity') - Subquery(held)
+        )
+
+    def release_expired(self):
+        """
+        Release expired reservations in batches, skipping those being converted into orders.
+        Returns the number of reservations released
+        """
+        released = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    Reservation.objects.select_for_update(skip_locked=True).filter(
+                        expires_at__lte=timezone.now()
+                    ).order_by('expires_at').values_list('pk', flat=True)[:self.batch_size]
+                )
+                if ids:
+                    self.release(ids)
+
+            released += len(ids)
+            if len(ids) < self.batch_size:
+                break
+
+        if released:
+            logger.info(f"Released {released} expired reservations")
+        return released
+
+
+reservation_service = ReservationService()
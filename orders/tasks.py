@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from .models import Order
 from .services.order_email_service import order_email_service
 from .services.order_sms_service import order_sms_service
+from .services.reservation_service import reservation_service
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -77,4 +78,12 @@ def send_admin_email(order_id):
     
     except Exception as e:
         logger.error(f"Failed to send admin email for order {order.id}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task
+def release_expired_reservations():
+    """
+    Give the stock held by expired reservations back
+    """
+    return reservation_service.release_expired()
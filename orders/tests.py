@@ -1,15 +1,28 @@
 from django.test import TestCase
 from django.core import mail
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
 from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
 from decimal import Decimal
+import json
+from io import StringIO
 
 from catalog.models import Category, Product
-from orders.models import Order, OrderItem
-from orders.tasks import send_order_notifications, send_customer_sms, send_admin_email
+from orders.models import Order, OrderItem, Reservation
+from orders.serializers import OrderCreateSerializer
+from orders.views import OrderListCreateAPIView
+from core.idempotency import LOCK_KEY
+from orders.tasks import send_order_notifications, send_customer_sms, send_admin_email, release_expired_reservations
+from orders.services.reservation_service import reservation_service
 from orders.services.order_email_service import OrderEmailService
 from orders.services.order_sms_service import OrderSMSSerive
 
@@ -107,11 +120,119 @@ class OrderCreationTestCase(APITestCase):
         self.assertEqual(self.product1.stock_quantity, 8) # 10 - 2
         self.assertEqual(self.product2.stock_quantity, 4) # 5 - 1
 
+        # Check popularity was counted
+        self.assertEqual(self.product1.units_sold, 2)
+        self.assertEqual(self.product2.units_sold, 1)
+
         # Check notifications were triggered with correct order id
         mock_notifications.assert_called_once()
         call_args = mock_notifications.call_args[0][0]
         self.assertEqual(call_args, order.id)
 
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_create_order_invalidates_cached_product(self, mock_notifications):
+        """Test stock decrements are visible on cached product responses"""
+        self.client.get(f'/api/v1/catalog/products/{self.product1.id}/')
+
+        self.authenticate_customer()
+        order_data = {
+            'items': [
+                {'product': self.product1.id, 'quantity': 3},
+            ]
+        }
+        self.client.post(path='/api/v1/orders/', data=order_data, format='json')
+
+        response = self.client.get(f'/api/v1/catalog/products/{self.product1.id}/')
+        self.assertEqual(response.json()['data']['stock_quantity'], 7)
+
+    def build_order(self, *lines):
+        """Helper to validate an order for the customer, ready to be saved"""
+        serializer = OrderCreateSerializer(
+            data={'items': [{'product': product.id, 'quantity': quantity} for product, quantity in lines]},
+            context={'request': SimpleNamespace(user=self.customer)}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def test_create_order_query_count_is_constant(self):
+        """Test saving an order takes the same number of queries whatever the cart size"""
+        products = [
+            Product.objects.create(name=f'Phone {i}', price=Decimal('100.00'), stock_quantity=10, category=self.category)
+            for i in range(10)
+        ]
+        small = self.build_order((products[0], 1))
+        large = self.build_order(*((product, 2) for product in products))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            small.save(customer=self.customer)
+        with CaptureQueriesContext(connection) as large_queries:
+            order = large.save(customer=self.customer)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.total_amount, Decimal('2000.00'))
+        self.assertEqual(Product.objects.get(pk=products[0].pk).stock_quantity, 7)
+
+    def test_create_order_rechecks_stock_under_lock(self):
+        """Test stock sold by a concurrent order after validation is not oversold"""
+        serializer = self.build_order((self.product1, 6))
+        Product.objects.filter(pk=self.product1.pk).update(stock_quantity=5)
+
+        with self.assertRaises(ValidationError):
+            serializer.save(customer=self.customer)
+
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(Product.objects.get(pk=self.product1.pk).stock_quantity, 5)
+
+    def test_create_order_updates_category_counters(self):
+        """Test stock decrements reach the category counters"""
+        self.build_order((self.product1, 4), (self.product2, 1)).save(customer=self.customer)
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total_stock, 10) # 6 + 4
+
+    def test_validate_cart_in_one_query(self):
+        """Test every product of the cart is resolved with a single query"""
+        products = [
+            Product.objects.create(name=f'Phone {i}', price=Decimal('100.00'), stock_quantity=10, category=self.category)
+            for i in range(20)
+        ]
+        serializer = OrderCreateSerializer(
+            data={'items': [{'product': product.id, 'quantity': 1} for product in products]},
+            context={'request': SimpleNamespace(user=self.customer)}
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['items'][0]['product'], products[0])
+
+    def test_create_order_reports_every_invalid_item(self):
+        """Test unknown, inactive, duplicate and out of stock items are all reported at once"""
+        self.authenticate_customer()
+        inactive = Product.objects.create(
+            name='Old Phone', price=Decimal('100.00'), stock_quantity=10, category=self.category, is_active=False
+        )
+
+        order_data = {
+            'items': [
+                {'product': self.product1.id, 'quantity': 11},
+                {'product': self.product2.id, 'quantity': 6},
+                {'product': inactive.id, 'quantity': 1},
+                {'product': 9999, 'quantity': 1},
+                {'product': self.product2.id, 'quantity': 1},
+            ]
+        }
+        response = self.client.post(path='/api/v1/orders/', data=order_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['errors']['items']
+        self.assertIn('Insufficient stock for Samsung S25', errors[0]['quantity'][0])
+        self.assertIn('Insufficient stock for Macbook Pro', errors[1]['quantity'][0])
+        self.assertIn('no longer available', errors[2]['product'][0])
+        self.assertIn('does not exist', errors[3]['product'][0])
+        self.assertIn('more than once', errors[4]['product'][0])
+        self.assertEqual(Order.objects.count(), 0)
+
     def test_create_order_insufficient_stock(self):
         """Test order creation with insufficient stock"""
         self.authenticate_customer()
@@ -267,6 +388,266 @@ class OrderCreationTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(Order.objects.count(), 0)
         
+class OrderIdempotencyTestCase(APITestCase):
+    def setUp(self):
+        """Set up a customer and a product"""
+        cache.clear()
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            user_type='customer',
+            phone_number='+254700000000',
+            address='Test Address, Nairobi'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Samsung S25',
+            price=Decimal('150000.00'),
+            stock_quantity=10,
+            category=self.category
+        )
+        token = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    def place_order(self, quantity=2, key='checkout-1'):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post(
+            '/api/v1/orders/', {'items': [{'product': self.product.id, 'quantity': quantity}]},
+            format='json', headers=headers
+        )
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_retry_replays_response(self, mock_notifications):
+        """Test a retry with the same key gets the first response without placing another order"""
+        first = self.place_order()
+        retry = self.place_order()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 8)
+        mock_notifications.assert_called_once()
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_keys_are_per_user(self, mock_notifications):
+        """Test another customer using the same key places their own order"""
+        self.place_order()
+        other = User.objects.create_user(
+            email='other@test.com', user_type='customer', phone_number='+254711111111', address='Mombasa'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        self.place_order()
+
+        self.assertEqual(Order.objects.count(), 2)
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_reused_key_with_different_payload(self, mock_notifications):
+        """Test a key sent again with another payload is rejected"""
+        self.place_order(quantity=2)
+        response = self.place_order(quantity=3)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_failed_request_can_be_retried(self, mock_notifications):
+        """Test a failed request is not stored, so a retry with the same key runs again"""
+        self.assertEqual(self.place_order(quantity=20).status_code, status.HTTP_400_BAD_REQUEST)
+        self.product.stock_quantity = 30
+        self.product.save()
+
+        response = self.place_order(quantity=20)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    @patch('core.idempotency.IdempotentCreateMixin.idempotency_wait_timeout', 0)
+    def test_concurrent_request_in_progress(self, mock_notifications):
+        """Test a duplicate arriving while the first request holds the key gets a conflict"""
+        self.place_order(key='checkout-2')
+        scope = OrderListCreateAPIView().get_idempotency_scope(
+            SimpleNamespace(path='/api/v1/orders/', user=self.customer), 'checkout-1'
+        )
+        cache.add(LOCK_KEY.format(scope=scope), 'other-request')
+
+        response = self.place_order()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_without_key(self, mock_notifications):
+        """Test requests without a key are never deduplicated"""
+        self.place_order(key=None)
+        self.place_order(key=None)
+
+        self.assertEqual(Order.objects.count(), 2)
+
+class ReservationTestCase(APITestCase):
+    def setUp(self):
+        """Set up a customer and products"""
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            user_type='customer',
+            phone_number='+254700000000',
+            address='Test Address, Nairobi'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(
+            name='Samsung S25', price=Decimal('150000.00'), stock_quantity=10, category=self.category
+        )
+        self.laptop = Product.objects.create(
+            name='Macbook Pro', price=Decimal('250000.00'), stock_quantity=5, category=self.category
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.customer).access_token}')
+
+    def reserve(self, *lines):
+        return self.client.post(
+            '/api/v1/orders/reservations/',
+            {'items': [{'product': product.id, 'quantity': quantity} for product, quantity in lines]},
+            format='json'
+        )
+
+    def get_reserved(self, product):
+        return Product.objects.get(pk=product.pk).reserved_quantity
+
+    def test_reserve_holds_stock(self):
+        """Test a reservation holds stock, which availability then excludes"""
+        response = self.reserve((self.phone, 8), (self.laptop, 1))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()['data']['items']), 2)
+        self.assertEqual(self.get_reserved(self.phone), 8)
+
+        with self.assertNumQueries(2): # authenticated user + availability
+            response = self.client.get(f'/api/v1/orders/availability/?products={self.phone.id},{self.laptop.id}')
+        self.assertEqual(response.json()['data'], [
+            {'product': self.phone.id, 'available': 2},
+            {'product': self.laptop.id, 'available': 4},
+        ])
+
+    def test_reserve_beyond_available_stock(self):
+        """Test stock held by another checkout cannot be reserved or ordered"""
+        self.reserve((self.phone, 8))
+
+        response = self.reserve((self.phone, 3))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Available: 2', str(response.json()['errors']))
+
+        response = self.client.post(
+            '/api/v1/orders/', {'items': [{'product': self.phone.id, 'quantity': 3}]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_reserved(self.phone), 8)
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_order_converts_reservation(self, mock_notifications):
+        """Test an order placed with a reservation buys the held stock"""
+        reservation_id = self.reserve((self.phone, 2), (self.laptop, 1)).json()['data']['id']
+
+        response = self.client.post('/api/v1/orders/', {'reservation': reservation_id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('550000.00'))
+        self.assertEqual(order.items.count(), 2)
+        phone = Product.objects.get(pk=self.phone.pk)
+        self.assertEqual((phone.stock_quantity, phone.reserved_quantity, phone.units_sold), (8, 0, 2))
+        self.assertFalse(Reservation.objects.exists())
+
+    @patch('orders.tasks.send_order_notifications.delay')
+    def test_order_rechecks_reserved_products(self, mock_notifications):
+        """Test a reservation is bought at the current price and not once a product was deactivated"""
+        reservation_id = self.reserve((self.phone, 2), (self.laptop, 1)).json()['data']['id']
+        self.laptop.is_active = False
+        self.laptop.save()
+
+        response = self.client.post('/api/v1/orders/', {'reservation': reservation_id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Macbook Pro is no longer available.', str(response.json()['errors']))
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual((self.get_reserved(self.phone), self.get_reserved(self.laptop)), (2, 1))
+
+        self.laptop.is_active = True
+        self.laptop.price = Decimal('200000.00')
+        self.laptop.save()
+
+        response = self.client.post('/api/v1/orders/', {'reservation': reservation_id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('500000.00'))
+        self.assertEqual((self.get_reserved(self.phone), self.get_reserved(self.laptop)), (0, 0))
+
+    def test_order_needs_items_or_reservation(self):
+        """Test an order gets its items from either the request or a reservation"""
+        reservation_id = self.reserve((self.phone, 2)).json()['data']['id']
+
+        response = self.client.post('/api/v1/orders/', {
+            'reservation': reservation_id, 'items': [{'product': self.phone.id, 'quantity': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_with_another_customers_reservation(self):
+        """Test customers cannot buy the stock held by someone else"""
+        reservation_id = self.reserve((self.phone, 2)).json()['data']['id']
+        other = User.objects.create_user(
+            email='other@test.com', user_type='customer', phone_number='+254711111111', address='Mombasa'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+
+        response = self.client.post('/api/v1/orders/', {'reservation': reservation_id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_release_reservation(self):
+        """Test customers can release their reservation"""
+        reservation_id = self.reserve((self.phone, 2)).json()['data']['id']
+
+        response = self.client.delete(f'/api/v1/orders/reservations/{reservation_id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_reserved(self.phone), 0)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_deleting_reservation_releases_stock(self):
+        """Test held stock comes back however a reservation is deleted"""
+        first = self.reserve((self.phone, 2), (self.laptop, 1)).json()['data']['id']
+        self.reserve((self.phone, 3))
+        self.reserve((self.laptop, 2))
+
+        Reservation.objects.get(pk=first).delete()
+        self.assertEqual((self.get_reserved(self.phone), self.get_reserved(self.laptop)), (3, 2))
+
+        # Like the admin "delete selected" action
+        Reservation.objects.filter(items__product=self.phone).delete()
+        self.assertEqual((self.get_reserved(self.phone), self.get_reserved(self.laptop)), (0, 2))
+
+        # Deleting the customer cascades to their reservations
+        self.customer.delete()
+        self.assertEqual((self.get_reserved(self.phone), self.get_reserved(self.laptop)), (0, 0))
+
+    def test_sweeper_releases_expired_reservations(self):
+        """Test expired reservations are released in batches and can no longer be ordered"""
+        expired = [self.reserve((self.phone, 1)).json()['data']['id'] for _ in range(3)]
+        self.reserve((self.laptop, 2))
+        Reservation.objects.filter(pk__in=expired).update(expires_at=timezone.now())
+
+        response = self.client.post('/api/v1/orders/', {'reservation': expired[0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch.object(reservation_service, 'batch_size', 2):
+            released = release_expired_reservations()
+
+        self.assertEqual(released, 3)
+        self.assertEqual(self.get_reserved(self.phone), 0)
+        self.assertEqual(self.get_reserved(self.laptop), 2)
+        self.assertEqual(Reservation.objects.count(), 1)
+
 class OrderListTestCase(APITestCase):
     def setUp(self):
         # Create test users
@@ -381,6 +762,115 @@ class OrderListTestCase(APITestCase):
 
         self.assertEqual(orders_count, len(response.data['results']))
 
+    def test_admin_can_page_orders_with_cursor(self):
+        """Admins can walk all orders with cursor pagination"""
+        self.authenticate_admin()
+
+        for _ in range(10):
+            Order.objects.create(customer=self.customer1, total_amount=Decimal('1000'))
+
+        first = self.client.get('/api/v1/orders/?pagination=cursor', format='json')
+        second = self.client.get(first.data['next'], format='json')
+
+        self.assertNotIn('count', first.data)
+        self.assertEqual(len(first.data['results']), 10)
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, list(Order.objects.order_by('-created_at', '-pk').values_list('id', flat=True)))
+
+    def create_orders(self, count, items=3):
+        """Helper to create orders with several items each"""
+        products = [
+            Product.objects.create(name=f'Phone {i}', price=Decimal('100.00'), stock_quantity=10, category=self.category)
+            for i in range(items)
+        ]
+        for _ in range(count):
+            order = Order.objects.create(customer=self.customer1, total_amount=Decimal('300.00'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, price=product.price) for product in products
+            ])
+
+    def test_order_list_query_count_is_constant(self):
+        """A page of orders takes the same number of queries however many orders it has"""
+        self.authenticate_admin()
+
+        with self.assertNumQueries(4): # user + count + orders with item totals + items
+            response = self.client.get('/api/v1/orders/', format='json')
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.create_orders(8)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/orders/', format='json')
+
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['total_items'], 6)
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+
+    def test_order_list_cursor_query_count(self):
+        """Cursor pages skip the count query"""
+        self.authenticate_admin()
+        self.create_orders(10)
+
+        with self.assertNumQueries(3): # user + orders with item totals + items
+            response = self.client.get('/api/v1/orders/?pagination=cursor', format='json')
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_order_list_total_items_without_items(self):
+        """Item totals are summed in the database when items are omitted"""
+        self.authenticate_admin()
+        self.create_orders(3)
+
+        with self.assertNumQueries(3): # user + count + orders with item totals
+            response = self.client.get('/api/v1/orders/?omit=items', format='json')
+
+        totals = {order['id']: order['total_items'] for order in response.data['results']}
+        self.assertEqual(totals[self.order1.id], 2)
+        self.assertEqual(sorted(totals.values()), [2, 2, 6, 6, 6])
+
+    def test_order_detail_query_count(self):
+        """An order is retrieved with its items and item total in a fixed number of queries"""
+        token = self.get_jwt_token(self.customer1)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        with self.assertNumQueries(3): # user + order with item total + items
+            response = self.client.get(f'/api/v1/orders/{self.order1.id}/', format='json')
+
+        self.assertEqual(response.data['total_items'], 2)
+
+    def test_order_list_with_sparse_fields(self):
+        """Orders can be listed with only some fields"""
+        self.authenticate_admin()
+
+        response = self.client.get('/api/v1/orders/?fields=id,status,total_amount', format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(set(order) == {'id', 'status', 'total_amount'} for order in response.data['results']))
+
+    def test_admin_can_export_orders(self):
+        """Admins can stream all orders with their items as NDJSON"""
+        self.authenticate_admin()
+
+        with self.assertNumQueries(3): # user + orders + items
+            response = self.client.get('/api/v1/orders/export/')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual({order['id'] for order in orders}, {self.order1.id, self.order2.id})
+        self.assertTrue(all(len(order['items']) == 1 for order in orders))
+
+    def test_customer_cannot_export_orders(self):
+        """Customers cannot export orders"""
+        token = self.get_jwt_token(self.customer1)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get('/api/v1/orders/export/')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 class OrderDetailTestCase(APITestCase):
     def setUp(self):
         # Create customers
@@ -1005,4 +1495,17 @@ class OrderSMSService(TestCase):
         
         self.assertFalse(result['success'])
         self.assertEqual(result['error'], 'No recipients found in API response')
-        self.assertEqual(result['phone'], '+254700123456')
\ No newline at end of file
+        self.assertEqual(result['phone'], '+254700123456')
+
+class ExplainQueriesCommandTestCase(TestCase):
+    def test_hot_queries_use_indexes(self):
+        """Test the endpoint queries are planned on the indexes instead of scanning products and orders"""
+        stdout = StringIO()
+
+        call_command('explain_queries', '--min-rows', '0', stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('product_category_created_idx', output)
+        self.assertIn('order_customer_created_idx', output)
+        self.assertNotIn('Sequential scan on catalog_product', output)
+        self.assertNotIn('Sequential scan on orders_order', output)
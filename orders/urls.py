@@ -5,5 +5,9 @@ app_name = 'orders'
 
 urlpatterns = [
     path('', views.OrderListCreateAPIView.as_view(), name='order-list'),
+    path('export/', views.OrderExportAPIView.as_view(), name='order-export'),
+    path('availability/', views.ProductAvailabilityAPIView.as_view(), name='product-availability'),
+    path('reservations/', views.ReservationCreateAPIView.as_view(), name='reservation-create'),
+    path('reservations/<int:pk>/', views.ReservationDetailAPIView.as_view(), name='reservation-detail'),
     path('<int:pk>/', views.OrderDetailAPIView.as_view(), name='order-detail'),
 ]
\ No newline at end of file
@@ -1,30 +1,64 @@
-from rest_framework import generics, status
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
 
-from .models import Order
-from .serializers import OrderCreateSerializer, OrderListSerializer
-from .permissions import IsCustomerOrAdminReadOnly
+from core.exports import StreamingExportMixin
+from core.fieldsets import SparseFieldsetQuerysetMixin
+from core.idempotency import IdempotentCreateMixin
+from core.pagination import PageNumberOrCursorPagination
+from core.permissions import IsAdmin
+
+from .models import Order, OrderItem, Reservation
+from .serializers import OrderCreateSerializer, OrderListSerializer, ReservationSerializer
+from .permissions import IsCustomer, IsCustomerOrAdminReadOnly
+from .services.reservation_service import reservation_service
 from .tasks import send_order_notifications
 
 User = get_user_model()
 
-class OrderListCreateAPIView(generics.ListCreateAPIView):
+class OrderFieldsetMixin(SparseFieldsetQuerysetMixin):
+    sparse_field_columns = {
+        'items': [],
+        'total_items': [],
+    }
+
+def get_orders():
+    """
+    Orders with their items prefetched and their item count summed in the database,
+    so a page of any size takes the same number of queries
+    """
+    items_quantity = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Order.objects.prefetch_related('items').annotate(items_quantity=Subquery(items_quantity))
+
+class CustomerOrdersMixin:
+    """
+    Customers only see their own orders, admins see all of them
+    """
+    def get_queryset(self):
+        user = self.request.user
+        if user.user_type == 'admin':
+            return get_orders()
+        return get_orders().filter(customer=user)
+
+class OrderListCreateAPIView(IdempotentCreateMixin, CustomerOrdersMixin, OrderFieldsetMixin, generics.ListCreateAPIView):
     """
     List customer's orders or create a new order
     """
     permission_classes = [IsCustomerOrAdminReadOnly]
+    pagination_class = PageNumberOrCursorPagination
+    cursor_ordering_fields = ['created_at']
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return OrderCreateSerializer
         return OrderListSerializer
-
-    def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'admin':
-            return Order.objects.all()
-        return Order.objects.filter(customer=self.request.user)
     
     def perform_create(self, serializer):
         # Set customer and details from authenticated user
@@ -47,16 +81,70 @@ class OrderListCreateAPIView(generics.ListCreateAPIView):
         # Send notifications
         send_order_notifications.delay(order.id)      
 
-class OrderDetailAPIView(generics.RetrieveAPIView):
+class OrderDetailAPIView(CustomerOrdersMixin, OrderFieldsetMixin, generics.RetrieveAPIView):
     """
     Retrieve a specific order
     Customers can only see their orders
     """
     permission_classes = [IsCustomerOrAdminReadOnly]
     serializer_class = OrderListSerializer
-    
+
+class OrderExportAPIView(StreamingExportMixin, OrderFieldsetMixin, generics.GenericAPIView):
+    """
+    Stream all orders with their items as NDJSON or CSV
+    Admins only
+    """
+    permission_classes = [IsAdmin]
+    serializer_class = OrderListSerializer
+    export_filename = 'orders'
+
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'admin':
-            return Order.objects.all()
-        return Order.objects.filter(customer=self.request.user)
\ No newline at end of file
+        return get_orders()
+
+
+class ReservationCreateAPIView(generics.CreateAPIView):
+    """
+    Hold stock for the customer's checkout until the reservation expires
+    Place the order with the reservation to buy the held stock
+    """
+    permission_classes = [IsCustomer]
+    serializer_class = ReservationSerializer
+
+class ReservationDetailAPIView(generics.RetrieveDestroyAPIView):
+    """
+    Retrieve or release one of the customer's live reservations
+    """
+    permission_classes = [IsCustomer]
+    serializer_class = ReservationSerializer
+
+    def get_queryset(self):
+        return Reservation.objects.filter(
+            customer=self.request.user, expires_at__gt=timezone.now()
+        ).prefetch_related('items')
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Lock it so an order or the sweeper cannot claim it meanwhile
+            if Reservation.objects.select_for_update().filter(pk=instance.pk).exists():
+                reservation_service.release([instance.pk])
+
+class ProductAvailabilityAPIView(APIView):
+    """
+    Units of each product that can still be ordered, net of live reservations
+    Products are given as ?products=1,2,3
+    """
+    permission_classes = [permissions.AllowAny]
+    max_products = 100
+
+    def get(self, request):
+        try:
+            ids = [int(pk) for pk in request.query_params.get('products', '').split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError({'products': ['Provide comma separated product IDs.']})
+        if not ids or len(ids) > self.max_products:
+            raise ValidationError({'products': [f'Provide 1 to {self.max_products} product IDs.']})
+
+        available = reservation_service.get_available(ids)
+        return Response([
+            {'product': pk, 'available': available[pk]} for pk in dict.fromkeys(ids) if pk in available
+        ])